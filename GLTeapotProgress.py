@@ -39,12 +39,14 @@ from OpenGL.GLUT import *
 from PIL import Image
 import pygame
 from objloader import *
+from detect import MarkerDetector, marker_index
 
 
 texture_object = None
 texture_background = None
 camera_matrix = None
 dist_coeff = None
+detector = None
 cap = cv2.VideoCapture(0)
 waterpitcher = None
 crow = None
@@ -62,9 +64,10 @@ Purpose: Loads the camera calibration file provided and returns the camera and
          distortion matrix saved in the calibration file.
 """
 def getCameraMatrix():
-        global camera_matrix, dist_coeff
+        global camera_matrix, dist_coeff, detector
         with np.load('Camera.npz') as X:
                 camera_matrix, dist_coeff, _, _ = [X[i] for i in ('mtx','dist','rvecs','tvecs')]
+        detector = MarkerDetector(camera_matrix, dist_coeff)
 
 
 
@@ -172,41 +175,11 @@ Purpose: This function takes the image in form of a numpy array, camera_matrix a
          distortion matrix as input and detects ArUco markers in the image. For each
          ArUco marker detected in image, paramters such as ID, centre coord, rvec
          and tvec are calculated and stored in a list in a prescribed format. The list
-         is returned as output for the function
+         is returned as output for the function. The dictionary, parameters and
+         calibration live in the MarkerDetector built by getCameraMatrix().
 """
 def detect_markers(img):
-        markerLength = 100
-        aruco_list = []
-        ######################## INSERT CODE HERE ########################
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        aruco_dict = aruco.Dictionary_get(aruco.DICT_5X5_250)
-        
-        parameters = aruco.DetectorParameters_create()
-        corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-        global Xc,Yc
-        
-        with np.load('Camera.npz') as X:
-              camera_matrix, dist_coeff, _, _ = [X[i] for i in ('mtx','dist','rvecs','tvecs')]
-              corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-              rvec, tvec,_= aruco.estimatePoseSingleMarkers(corners, markerLength, camera_matrix, dist_coeff)
-              
-              j=0
-              if ids is not None:
-                      for i in ids:
-                             
-                              
-                              Xc=(corners[j][0][0][0]+corners[j][0][1][0]+corners[j][0][2][0]+corners[j][0][3][0])/4
-                              Yc=(corners[j][0][0][1]+corners[j][0][1][1]+corners[j][0][2][1]+corners[j][0][3][1])/4
-                              aruco_centre=(Xc,Yc)
-            
-                              rvect = np.array([rvec[j].reshape(1,1,3)])
-                              tvect = np.array([tvec[j].reshape(1,1,3)])
-                              tup1 = (int(i),aruco_centre,rvect[0],tvect[0])
-                              aruco_list.append(tup1)
-                              j=j+1
-        
-        return aruco_list
+        return detector.detect(img)
 ########################################################################
 
 
@@ -310,19 +283,18 @@ Output: None
 Purpose: Receives the ArUco information as input and overlays the 3D Model of a teapot
          on the ArUco marker. That ArUco information is used to
          calculate the rotation matrix and subsequently the view matrix. Then that view matrix
-         is loaded as current matrix and the 3D model is rendered.
+         is loaded as current matrix and the 3D model is rendered. The marker
+         is looked up by id through detect.marker_index(), so any number of
+         markers can be in view.
 
          Parts of this code are already completed, you just need to fill in the blanks. You may
          however add your own code in this function.
 """
 def overlay(img, ar_list, ar_id, texture_file):
-        if(ar_list[0][0]==ar_id):
-                index = 0 
-        else:
-                        index = 1
+        marker = marker_index(ar_list)[ar_id]
 
         if(ar_id == 0):
-                centre, rvec, tvec = ar_list[index][1], ar_list[index][2], ar_list[index][3]                        
+                centre, rvec, tvec = marker[1], marker[2], marker[3]
                 rmtx = cv2.Rodrigues(rvec)[0]
                 tmtx = cv2.Rodrigues(tvec)[0]
                 
@@ -339,7 +311,7 @@ def overlay(img, ar_list, ar_id, texture_file):
                 glPopMatrix()
 
         elif(ar_id == 1):
-                centre, rvec, tvec = ar_list[index][1], ar_list[index][2], ar_list[index][3]                        
+                centre, rvec, tvec = marker[1], marker[2], marker[3]
                 rmtx = cv2.Rodrigues(rvec)[0]
                 tmtx = cv2.Rodrigues(tvec)[0]
                 
@@ -0,0 +1,191 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: arena.py
+*  Team: eYRC#TC#1155
+*
+*  Static arena mode. The pebble and pitcher markers never move during a
+*  run, only the crow robot does. survey() watches the arena for a few
+*  seconds (same loop as Task 2/Say_Cheese.py), averages the pose of every
+*  fixed marker and saves an arena map. ArenaDetector loads the map and
+*  then only looks for the robot marker inside the arena region.
+*
+*  python arena.py --camera 1 --robot 1 --seconds 3 --out arena_map.npz
+*
+**************************************************************************
+"""
+
+import argparse
+import time
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from detect import MarkerDetector, MARKER_DTYPE, make_marker_table, table_to_list
+from calibration import Calibration
+
+ROBOT_ID = 1
+
+
+"""
+Function Name : mean_rvec()
+Input: rvecs (N,3)
+Output: rvec (3,) of the mean rotation
+Purpose: Averages the rotation matrices and projects the result back onto a
+         rotation with an SVD, which is safe for the small spread of a marker
+         seen from a fixed camera.
+"""
+def mean_rvec(rvecs):
+        mean = np.zeros((3,3))
+        for rvec in rvecs:
+                mean += cv2.Rodrigues(np.asarray(rvec, np.float64).reshape(3,1))[0]
+        u, _, vt = np.linalg.svd(mean/len(rvecs))
+        rotation = u.dot(vt)
+        if np.linalg.det(rotation) < 0:
+                u[:,-1] = -u[:,-1]
+                rotation = u.dot(vt)
+        return cv2.Rodrigues(rotation)[0].reshape(3)
+
+"""
+Function Name : average_tables()
+Input: list of marker tables collected during the survey, robot_id,
+       min_fraction (fraction of the frames a marker must appear in)
+Output: marker table with one averaged row per fixed marker
+"""
+def average_tables(tables, robot_id, min_fraction=0.5):
+        rows = np.concatenate(tables) if tables else np.zeros(0, MARKER_DTYPE)
+        rows = rows[rows['id'] != robot_id]
+        ids, corners, rvecs, tvecs = [], [], [], []
+        for marker_id in np.unique(rows['id']):
+                seen = rows[rows['id'] == marker_id]
+                if len(seen) < min_fraction*len(tables):
+                        continue
+                ids.append(marker_id)
+                corners.append(seen['corners'].mean(axis=0))
+                rvecs.append(mean_rvec(seen['rvec'].reshape(-1,3)))
+                tvecs.append(seen['tvec'].reshape(-1,3).mean(axis=0))
+        return make_marker_table(np.array(ids, np.int32), np.array(corners, np.float32).reshape(-1,4,2),
+                                 np.array(rvecs).reshape(-1,3), np.array(tvecs).reshape(-1,3))
+
+"""
+Function Name : arena_region()
+Input: marker table of the fixed markers, frame size (width, height), padding
+       (pixels added around the markers)
+Output: (x0, y0, x1, y1) region the robot is searched in
+"""
+def arena_region(table, size, padding):
+        if len(table) == 0:
+                return (0, 0, size[0], size[1])
+        corners = table['corners'].reshape(-1,2)
+        x0, y0 = np.floor(corners.min(axis=0) - padding).astype(int)
+        x1, y1 = np.ceil(corners.max(axis=0) + padding).astype(int)
+        return (max(x0, 0), max(y0, 0), min(x1, size[0]), min(y1, size[1]))
+
+"""
+Function Name : survey()
+Input: cap (cv2.VideoCapture), detector, seconds, robot_id, show (draw the
+       detections in a window like Say_Cheese.py)
+Output: averaged marker table of the fixed markers, frame size
+"""
+def survey(cap, detector, seconds=3.0, robot_id=ROBOT_ID, show=True):
+        tables = []
+        size = None
+        end = time.time() + seconds
+        while time.time() < end:
+                ret, frame = cap.read()
+                if ret != True:
+                        continue
+                size = (frame.shape[1], frame.shape[0])
+                table = detector.detect_table(frame)
+                tables.append(table)
+                if show:
+                        aruco.drawDetectedMarkers(frame, list(table['corners'].reshape(-1,1,4,2)),
+                                                  table['id'].reshape(-1,1))
+                        cv2.imshow("frame", frame)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                                break
+        return average_tables(tables, robot_id), size
+
+"""
+Function Name : save_arena_map()
+Input: path, marker table of the fixed markers, frame size, robot_id, padding
+Output: None
+"""
+def save_arena_map(path, table, size, robot_id=ROBOT_ID, padding=150):
+        np.savez(path, markers=np.asarray(table).view(np.ndarray), size=np.array(size),
+                 robot_id=robot_id, region=np.array(arena_region(table, size, padding)))
+
+"""
+Function Name : load_arena_map()
+Input: path of the arena map
+Output: marker table of the fixed markers, robot_id, region (x0, y0, x1, y1)
+"""
+def load_arena_map(path):
+        with np.load(path) as X:
+                table = X['markers'].astype(MARKER_DTYPE).view(np.recarray)
+                return table, int(X['robot_id']), tuple(int(v) for v in X['region'])
+
+
+"""
+Class Name : ArenaDetector
+Input: arena_map (path or the tuple from load_arena_map), then the same
+       arguments as MarkerDetector
+Purpose: Detects only the robot marker, inside the arena region, and returns it
+         together with the cached poses of the fixed markers.
+"""
+class ArenaDetector(MarkerDetector):
+        def __init__(self, arena_map, *args, **kwargs):
+                MarkerDetector.__init__(self, *args, **kwargs)
+                if isinstance(arena_map, str):
+                        arena_map = load_arena_map(arena_map)
+                self.fixed, self.robot_id, self.region = arena_map
+
+        """
+        Function Name : detect_table()
+        Input: img (numpy array, BGR or already gray)
+        Output: marker table with the robot (if found) and the fixed markers
+        """
+        def detect_table(self, img):
+                x0, y0, x1, y1 = self.region
+                crop = img[y0:y1, x0:x1]
+                if crop.ndim == 3:
+                        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+                corners, ids = self.find_corners(crop)
+                robot = ids == self.robot_id
+                corners = corners[robot] + np.float32([x0, y0])
+                robot_table = self.estimate_table(corners, ids[robot])
+                return np.concatenate([robot_table, self.fixed]).view(np.recarray)
+
+
+"""
+Function Name : main()
+Purpose: Surveys the arena from the camera and saves the arena map.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Survey the fixed arena markers.')
+        parser.add_argument('--camera', type=int, default=1, help='camera index')
+        parser.add_argument('--calibration', default='Camera.npz')
+        parser.add_argument('--robot', type=int, default=ROBOT_ID, help='id of the robot marker')
+        parser.add_argument('--seconds', type=float, default=3.0)
+        parser.add_argument('--padding', type=int, default=150,
+                            help='pixels around the fixed markers where the robot is searched')
+        parser.add_argument('--out', default='arena_map.npz')
+        args = parser.parse_args()
+
+        cap = cv2.VideoCapture(args.camera)
+        calibration = Calibration(args.calibration)
+        detector = MarkerDetector(calibration.camera_matrix, calibration.dist_coeff)
+        table, size = survey(cap, detector, args.seconds, args.robot)
+        cap.release()
+        cv2.destroyAllWindows()
+        if size is None:
+                raise SystemExit('no frames from camera %d' % args.camera)
+        save_arena_map(args.out, table, size, args.robot, args.padding)
+        for marker in table_to_list(table):
+                print(marker)
+        print('saved %d fixed markers to %s' % (len(table), args.out))
+
+
+if __name__ == "__main__":
+        main()
@@ -0,0 +1,283 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: assets.py
+*  Team: eYRC#TC#1155
+*
+*  Loads the OBJ models of the AR scene in the background. The OBJ text is
+*  parsed and triangulated (or read from its mesh cache) and the textures
+*  are decoded in a process pool, while the window opens and the camera
+*  warms up. The GL thread calls poll() once a frame, which uploads the
+*  finished models to the GPU, so they show up as they become ready
+*  instead of the app freezing until all of them are loaded. Models are
+*  registered by name and loaded on their first get(). The CPU and GPU
+*  bytes of every model are tracked, and over the budget the least
+*  recently used models are dropped and their GL buffers and textures
+*  freed.
+*
+**************************************************************************
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+import multiprocessing
+import numpy as np
+from OpenGL.GL import glDeleteTextures
+from objloader import OBJ, MESH_ARRAYS, VERTEX_SIZE, build_mesh, load_mesh, save_mesh, read_mtl, upload_materials
+
+
+"""
+Function Name : read_asset()
+Input: filename (OBJ file), swapyz
+Output: (mesh of objloader.build_mesh(), materials of objloader.read_mtl()
+        with the textures decoded, None without an mtllib)
+Purpose: All the CPU work of loading a model, run in a worker process. The
+         mesh comes from the cache next to the OBJ file when it is up to
+         date, and the cache is written when it is not.
+"""
+def read_asset(filename, swapyz):
+        mesh = load_mesh(filename, swapyz)
+        if mesh is None:
+                mesh = build_mesh(filename, swapyz)
+                save_mesh(filename, swapyz, mesh)
+        else:
+                # memory maps are copied into plain arrays to be sent back
+                for name in MESH_ARRAYS:
+                        mesh[name] = np.array(mesh[name])
+        materials = read_mtl(mesh['mtllib']) if mesh['mtllib'] is not None else None
+        return mesh, materials
+
+"""
+Function Name : model_bytes()
+Input: OBJ
+Output: (bytes of its arrays in memory, bytes of its buffers or display
+        list on the GPU, not counting textures)
+Purpose: A display list is counted as the interleaved vertices of every
+         face corner, which is what the driver has to keep for it.
+"""
+def model_bytes(model):
+        cpu = sum(np.asarray(getattr(model, name)).nbytes for name in MESH_ARRAYS)
+        if model.vbo is not None:
+                gpu = model.interleaved.nbytes + model.indices.nbytes
+        elif model.gl_list is not None:
+                gpu = len(model.corners)*VERTEX_SIZE*4
+        else:
+                gpu = 0
+        return cpu, gpu
+
+
+"""
+Class Name : AssetManager
+Input: workers (processes, one per core by default), vbo (draw the models
+       from vertex buffer objects), budget (most CPU + GPU bytes of the
+       loaded models and textures, no limit if None)
+Purpose: Submits the models to the process pool and makes the GL objects of
+         the finished ones on the GL thread. Textures are shared by file
+         name between the models and deleted with the last model using
+         them. assets is ordered from the least to the most recently used.
+         The workers are spawned, not forked: they start on the first load,
+         when the capture and detection threads and the GL context already
+         exist, and a fork copies none of those threads but any lock one of
+         them held.
+"""
+class AssetManager:
+        def __init__(self, workers=None, vbo=True, budget=None):
+                self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+                self.vbo = vbo
+                self.budget = budget
+                self.files = {}
+                self.pending = {}
+                self.assets = OrderedDict()
+                self.sizes = {}
+                self.textures = {}
+                self.texture_bytes = {}
+                self.texture_users = {}
+                self.failed = {}
+                self.hits = 0
+                self.misses = 0
+                self.waits = 0
+                self.evictions = 0
+
+        """
+        Function Name : register()
+        Input: name of the asset, filename (OBJ file), swapyz
+        Output: None
+        Purpose: Makes the model known by name without loading it.
+        """
+        def register(self, name, filename, swapyz=False):
+                self.files[name] = (filename, swapyz)
+
+        """
+        Function Name : load()
+        Input: name of the asset, filename (OBJ file, the registered one if
+               None), swapyz
+        Output: None
+        Purpose: Starts loading the model in the background, unless it is
+                 already loaded or loading. A model that failed to load is
+                 tried again only when it is registered again.
+        """
+        def load(self, name, filename=None, swapyz=False):
+                if filename is not None:
+                        self.register(name, filename, swapyz)
+                        self.failed.pop(name, None)
+                filename, swapyz = self.files[name]
+                if name not in self.assets and name not in self.pending and name not in self.failed:
+                        self.pending[name] = (filename, swapyz, self.pool.submit(read_asset, filename, swapyz))
+
+        """
+        Function Name : poll()
+        Input: limit (most models uploaded in this call, all if None)
+        Output: names of the models that became ready
+        Purpose: Called on the GL thread. Uploads the buffers and textures of
+                 every finished model in one pass and never waits for the
+                 ones still loading. A model whose loading or upload raises
+                 (a missing texture, a broken OBJ file) is printed and kept
+                 in failed, it is never drawn and rendering goes on.
+        """
+        def poll(self, limit=None):
+                ready = []
+                for name, (filename, swapyz, future) in list(self.pending.items()):
+                        if limit is not None and len(ready) >= limit:
+                                break
+                        if future.done():
+                                del self.pending[name]
+                                try:
+                                        model, images = self.make_model(filename, swapyz, *future.result())
+                                except Exception as error:
+                                        print('asset %s (%s) failed to load: %r' % (name, filename, error))
+                                        self.failed[name] = error
+                                        continue
+                                for image, size in images:
+                                        self.texture_bytes[image] = size
+                                        self.texture_users.setdefault(image, set()).add(name)
+                                self.assets[name] = model
+                                self.sizes[name] = model_bytes(model)
+                                ready.append(name)
+                                self.evict(keep=name)
+                return ready
+
+        """
+        Function Name : make_model()
+        Input: filename, swapyz, mesh and materials of read_asset()
+        Output: OBJ, list of (texture file, bytes) of its textures
+        Purpose: Makes the GL objects of a loaded model on the GL thread.
+        """
+        def make_model(self, filename, swapyz, mesh, materials):
+                images = []
+                if materials is not None:
+                        for mtl in materials.values():
+                                if 'image_Kd' in mtl:
+                                        _, ix, iy = mtl['image_Kd']
+                                        images.append((mtl['map_Kd'][0], ix*iy*4))
+                        materials = upload_materials(materials, self.textures)
+                return OBJ(filename, swapyz, vbo=self.vbo, mesh=mesh, mtl=materials), images
+
+        """
+        Function Name : evict()
+        Input: keep (name of an asset never evicted)
+        Output: names of the evicted assets
+        Purpose: Unloads the least recently used assets while the loaded
+                 ones are over the budget.
+        """
+        def evict(self, keep=None):
+                evicted = []
+                while self.budget is not None and sum(self.memory()) > self.budget:
+                        name = next((n for n in self.assets if n != keep), None)
+                        if name is None:
+                                break
+                        self.unload(name)
+                        self.evictions += 1
+                        evicted.append(name)
+                return evicted
+
+        """
+        Function Name : unload()
+        Input: name of the asset
+        Output: None
+        Purpose: Frees the GL buffers of the model, and the textures no other
+                 loaded model uses. The next get() loads it again.
+        """
+        def unload(self, name):
+                self.assets.pop(name).free()
+                del self.sizes[name]
+                for image, users in list(self.texture_users.items()):
+                        users.discard(name)
+                        if not users:
+                                glDeleteTextures([self.textures.pop(image)])
+                                del self.texture_users[image]
+                                del self.texture_bytes[image]
+
+        """
+        Function Name : memory()
+        Input: None
+        Output: (CPU bytes, GPU bytes) of the loaded models and textures
+        """
+        def memory(self):
+                cpu = sum(size[0] for size in self.sizes.values())
+                gpu = sum(size[1] for size in self.sizes.values()) + sum(self.texture_bytes.values())
+                return cpu, gpu
+
+        """
+        Function Name : get()
+        Input: name of the asset
+        Output: OBJ, or None while it is still loading
+        Purpose: A loaded asset is a hit and becomes the most recently used.
+                 Otherwise the first reference is a miss that starts the
+                 load and the next ones, until it is ready, are waits. A
+                 failed asset is always None.
+        """
+        def get(self, name):
+                if name in self.assets:
+                        self.hits += 1
+                        self.assets.move_to_end(name)
+                        return self.assets[name]
+                if name in self.failed:
+                        return None
+                if name in self.pending:
+                        self.waits += 1
+                else:
+                        self.misses += 1
+                        self.load(name)
+                return None
+
+        """
+        Function Name : stats()
+        Input: None
+        Output: dict of the hit, miss, wait and eviction counts, the hit
+                rate, the CPU and GPU bytes in total and of every loaded
+                asset (textures counted for every asset using them), and
+                the names of the failed assets
+        """
+        def stats(self):
+                cpu, gpu = self.memory()
+                assets = {}
+                for name, (asset_cpu, asset_gpu) in self.sizes.items():
+                        textures = sum(self.texture_bytes[image] for image, users in self.texture_users.items()
+                                       if name in users)
+                        assets[name] = {'cpu_bytes': asset_cpu, 'gpu_bytes': asset_gpu + textures}
+                references = self.hits + self.misses + self.waits
+                return {'hits': self.hits, 'misses': self.misses, 'waits': self.waits,
+                        'evictions': self.evictions, 'hit_rate': self.hits/references if references else 0.0,
+                        'cpu_bytes': cpu, 'gpu_bytes': gpu, 'budget': self.budget, 'assets': assets,
+                        'failed': sorted(self.failed)}
+
+        """
+        Function Name : wait()
+        Input: None
+        Output: names of the models that became ready
+        Purpose: Blocks until every model submitted so far is loaded.
+        """
+        def wait(self):
+                wait([future for _, _, future in self.pending.values()])
+                return self.poll()
+
+        """
+        Function Name : close()
+        Input: None
+        Output: None
+        Purpose: Stops the worker processes.
+        """
+        def close(self):
+                self.pool.shutdown(wait=False)
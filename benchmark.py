@@ -0,0 +1,196 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: benchmark.py
+*  Team: eYRC#TC#1155
+*
+*  Times the detection modes against the plain full resolution
+*  MarkerDetector and reports how far their results are from it. With
+*  --synthetic the modes run on generated frames (synthetic.py) and are
+*  checked against the ground truth instead.
+*
+*  python benchmark.py --camera Camera.npz --images "Task 1/Task 1.1/TestCases"
+*                      --scale 0.5 0.75 --tiles 2x2 --max-marker 150
+*
+**************************************************************************
+"""
+
+import argparse
+import glob
+import os
+import time
+import numpy as np
+import cv2
+from detect import MarkerDetector, TiledDetector
+from synthetic import SceneConfig, generate
+from results_store import rvec_error
+
+
+"""
+Function Name : load_images()
+Input: folder (or a single image file), resize (scale factor applied to the
+       images, to try bigger frames than the test cases)
+Output: list of (file name, gray image)
+"""
+def load_images(folder, resize=1.0):
+        if os.path.isfile(folder):
+                paths = [folder]
+        else:
+                paths = sorted(glob.glob(os.path.join(folder, '*.jpg')) + glob.glob(os.path.join(folder, '*.png')))
+        images = []
+        for path in paths:
+                img = cv2.imread(path)
+                if img is not None:
+                        if resize != 1.0:
+                                img = cv2.resize(img, None, fx=resize, fy=resize, interpolation=cv2.INTER_CUBIC)
+                        images.append((os.path.basename(path), cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+        return images
+
+"""
+Function Name : time_detector()
+Input: detector, images (list of (name, gray)), repeat
+Output: mean time per image in ms, list of marker tables
+"""
+def time_detector(detector, images, repeat=5):
+        tables = [detector.detect_table(gray) for _, gray in images]
+        start = time.perf_counter()
+        for _ in range(repeat):
+                for _, gray in images:
+                        detector.detect_table(gray)
+        elapsed = time.perf_counter() - start
+        return elapsed*1000.0/(repeat*max(len(images), 1)), tables
+
+"""
+Function Name : compare_tables()
+Input: reference marker table, marker table to check
+Output: dict with matched, missed and extra marker counts, and the largest
+        centre (px), corner (px), rvec (rad, see rvec_error()) and tvec (% of
+        distance) errors over the matched markers
+"""
+def compare_tables(ref, test):
+        common, ri, ti = np.intersect1d(ref['id'], test['id'], return_indices=True)
+        result = {'matched': len(common), 'missed': len(ref) - len(common), 'extra': len(test) - len(common),
+                  'centre': 0.0, 'corner': 0.0, 'rvec': 0.0, 'tvec': 0.0}
+        if len(common):
+                r, t = ref[ri], test[ti]
+                result['centre'] = float(np.abs(r['centre'] - t['centre']).max())
+                result['corner'] = float(np.abs(r['corners'] - t['corners']).max())
+                result['rvec'] = float(rvec_error(r['rvec'], t['rvec']).max())
+                dist = np.linalg.norm(r['tvec'].reshape(-1,3), axis=1)
+                result['tvec'] = float((np.linalg.norm((r['tvec'] - t['tvec']).reshape(-1,3), axis=1)/dist).max()*100)
+        return result
+
+"""
+Function Name : summarise()
+Input: reference tables, tables to check
+Output: dict of totals and worst errors over all images
+"""
+def summarise(ref_tables, tables):
+        total = {'matched': 0, 'missed': 0, 'extra': 0, 'centre': 0.0, 'corner': 0.0, 'rvec': 0.0, 'tvec': 0.0}
+        for ref, test in zip(ref_tables, tables):
+                accumulate(total, compare_tables(ref, test))
+        return total
+
+"""
+Function Name : accumulate()
+Input: summary (changed in place), result of compare_tables()
+Output: None
+"""
+def accumulate(total, result):
+        for key in ('matched', 'missed', 'extra'):
+                total[key] += result[key]
+        for key in ('centre', 'corner', 'rvec', 'tvec'):
+                total[key] = max(total[key], result[key])
+
+"""
+Function Name : time_stream()
+Input: detectors (list of (name, detector)), stream of (index, frame, ground
+       truth table) from synthetic.generate()
+Output: list of (name, time per frame in ms, summary against the ground truth)
+Purpose: Runs every detector on each frame as it arrives, so the frames never
+         have to be kept or written to disk.
+"""
+def time_stream(detectors, stream):
+        times = [0.0]*len(detectors)
+        totals = [summarise([], []) for _ in detectors]
+        count = 0
+        for _, frame, truth in stream:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                for j, (_, detector) in enumerate(detectors):
+                        start = time.perf_counter()
+                        table = detector.detect_table(gray)
+                        times[j] += time.perf_counter() - start
+                        accumulate(totals[j], compare_tables(truth, table))
+                count += 1
+        return [(name, times[j]*1000.0/max(count, 1), totals[j]) for j, (name, _) in enumerate(detectors)]
+
+"""
+Function Name : report()
+Input: name of the mode, time in ms, reference time in ms, summary
+Output: None
+Purpose: Prints one line of the benchmark table.
+"""
+def report(name, ms, ref_ms, total):
+        print('%-16s %8.2f ms %6.2fx  matched %3d missed %3d extra %3d  centre %6.2f px  corner %6.2f px'
+              '  rvec %6.3f  tvec %6.2f %%' % (name, ms, ref_ms/ms if ms else 0.0, total['matched'],
+              total['missed'], total['extra'], total['centre'], total['corner'], total['rvec'], total['tvec']))
+
+"""
+Function Name : main()
+Purpose: Parses the command line and runs the benchmark.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Benchmark the ArUco detection modes.')
+        parser.add_argument('--camera', default='Camera.npz', help='calibration file')
+        parser.add_argument('--images', default=os.path.join('Task 1', 'Task 1.1', 'TestCases'),
+                            help='folder of test images')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--resize', type=float, default=1.0,
+                            help='resize the images first, e.g. 3 for 1920x1440 frames')
+        parser.add_argument('--scale', type=float, nargs='*', default=[0.5],
+                            help='scales for the multi-scale mode')
+        parser.add_argument('--tiles', nargs='*', default=['2x2'],
+                            help='tile grids for the tiled mode, as COLSxROWS')
+        parser.add_argument('--max-marker', type=int, default=100,
+                            help='side in pixels of the largest marker found in the tiles, larger ones are '
+                                 'found in a downscaled full frame pass')
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='benchmark on this many synthetic frames against their ground truth')
+        parser.add_argument('--workers', type=int, default=None, help='processes making synthetic frames')
+        args = parser.parse_args()
+
+        with np.load(args.camera) as X:
+                camera_matrix, dist_coeff = X['mtx'], X['dist']
+        if args.synthetic:
+                detectors = [('full', MarkerDetector(camera_matrix, dist_coeff))]
+                detectors += [('scale %.2f' % scale, MarkerDetector(camera_matrix, dist_coeff, scale=scale))
+                              for scale in args.scale]
+                detectors += [('tiles ' + grid, TiledDetector(camera_matrix, dist_coeff, max_marker=args.max_marker,
+                                                              tiles=tuple(int(n) for n in grid.split('x'))))
+                              for grid in args.tiles]
+                stream = generate(SceneConfig(camera_matrix, dist_coeff), args.synthetic, workers=args.workers)
+                results = time_stream(detectors, stream)
+                for name, ms, total in results:
+                        report(name, ms, results[0][1], total)
+                return
+        images = load_images(args.images, args.resize)
+        if not images:
+                raise SystemExit('no images found in ' + args.images)
+
+        ref_ms, ref_tables = time_detector(MarkerDetector(camera_matrix, dist_coeff), images, args.repeat)
+        report('full', ref_ms, ref_ms, summarise(ref_tables, ref_tables))
+        for scale in args.scale:
+                detector = MarkerDetector(camera_matrix, dist_coeff, scale=scale)
+                ms, tables = time_detector(detector, images, args.repeat)
+                report('scale %.2f' % scale, ms, ref_ms, summarise(ref_tables, tables))
+        for grid in args.tiles:
+                tiles = tuple(int(n) for n in grid.split('x'))
+                detector = TiledDetector(camera_matrix, dist_coeff, tiles=tiles, max_marker=args.max_marker)
+                ms, tables = time_detector(detector, images, args.repeat)
+                report('tiles ' + grid, ms, ref_ms, summarise(ref_tables, tables))
+
+
+if __name__ == "__main__":
+        main()
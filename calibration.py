@@ -0,0 +1,101 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: calibration.py
+*  Team: eYRC#TC#1155
+*
+*  Camera calibration from Camera.npz with cached undistortion maps.
+*
+**************************************************************************
+"""
+
+import hashlib
+import os
+import numpy as np
+import cv2
+
+
+"""
+Class Name : Calibration
+Input: filename of the calibration file (Camera.npz)
+Purpose: Loads camera_matrix and dist_coeff once. Frames can be undistorted
+         with cv2.remap using tables from cv2.initUndistortRectifyMap. The
+         tables are built once per resolution and kept in memory, and saved
+         next to the calibration file, so later runs only have to load them.
+         The cache files are keyed by a hash of the calibration, so a new
+         calibration never picks up stale tables.
+"""
+class Calibration:
+        def __init__(self, filename='Camera.npz'):
+                self.filename = filename
+                with np.load(filename) as X:
+                        self.camera_matrix, self.dist_coeff = X['mtx'], X['dist']
+                digest = hashlib.sha1()
+                digest.update(np.ascontiguousarray(self.camera_matrix, np.float64).tobytes())
+                digest.update(np.ascontiguousarray(self.dist_coeff, np.float64).tobytes())
+                self.key = digest.hexdigest()[:16]
+                self.maps = {}
+
+        """
+        Function Name : map_file()
+        Input: size (width, height)
+        Output: path of the cache file for the undistortion maps
+        """
+        def map_file(self, size):
+                folder = os.path.dirname(os.path.abspath(self.filename))
+                name = os.path.splitext(os.path.basename(self.filename))[0]
+                return os.path.join(folder, '%s.undistort-%s-%dx%d.npz' % (name, self.key, size[0], size[1]))
+
+        """
+        Function Name : undistort_maps()
+        Input: size (width, height)
+        Output: map1, map2 for cv2.remap
+        Purpose: Returns the remap tables for the resolution, from memory, from
+                 the cache file, or by building and saving them.
+        """
+        def undistort_maps(self, size):
+                size = (int(size[0]), int(size[1]))
+                if size in self.maps:
+                        return self.maps[size]
+                path = self.map_file(size)
+                maps = None
+                if os.path.exists(path):
+                        try:
+                                with np.load(path) as X:
+                                        maps = X['map1'], X['map2']
+                        except (IOError, ValueError, KeyError):
+                                maps = None
+                if maps is None:
+                        maps = cv2.initUndistortRectifyMap(self.camera_matrix, self.dist_coeff, None,
+                                                           self.camera_matrix, size, cv2.CV_16SC2)
+                        try:
+                                with open(path + '.tmp', 'wb') as f:
+                                        np.savez(f, map1=maps[0], map2=maps[1])
+                                os.replace(path + '.tmp', path)
+                        except (IOError, OSError):
+                                pass
+                self.maps[size] = maps
+                return maps
+
+        """
+        Function Name : undistort()
+        Input: img (numpy array)
+        Output: undistorted image
+        Purpose: Undistorts the frame with the cached remap tables. The result
+                 has the same camera_matrix and no distortion (see
+                 undistorted_coeff()).
+        """
+        def undistort(self, img):
+                map1, map2 = self.undistort_maps((img.shape[1], img.shape[0]))
+                return cv2.remap(img, map1, map2, cv2.INTER_LINEAR)
+
+        """
+        Function Name : undistorted_coeff()
+        Input: None
+        Output: zero distortion coefficients, to use for poses estimated on
+                undistorted frames
+        """
+        def undistorted_coeff(self):
+                return np.zeros_like(self.dist_coeff)
@@ -0,0 +1,120 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: capture.py
+*  Team: eYRC#TC#1155
+*
+*  Camera capture on a background thread, so the GLUT idle callback never
+*  waits on cap.read() and always draws the newest frame.
+*
+**************************************************************************
+"""
+
+import threading
+import time
+from collections import deque
+import cv2
+
+
+"""
+Class Name : FrameGrabber
+Input: source (camera index or video file), buffer_size (frames kept in the ring)
+Purpose: Reads frames from cv2.VideoCapture on its own thread into a small ring
+         buffer. read() always hands out the newest frame; frames that were
+         overwritten before anybody read them are counted in frames_dropped.
+"""
+class FrameGrabber:
+        def __init__(self, source=1, buffer_size=2):
+                self.cap = cv2.VideoCapture(source)
+                # keep OpenCV's own queue as short as the driver allows
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                self.ring = deque(maxlen=buffer_size)
+                self.lock = threading.Condition()
+                self.thread = None
+                self.running = False
+                self.frames_captured = 0
+                self.frames_dropped = 0
+                self.last_seq = 0
+
+        """
+        Function Name : start()
+        Input: None
+        Output: self
+        Purpose: Starts the capture thread.
+        """
+        def start(self):
+                if self.thread is None:
+                        self.running = True
+                        self.thread = threading.Thread(target=self.run, daemon=True)
+                        self.thread.start()
+                return self
+
+        """
+        Function Name : run()
+        Input: None
+        Output: None
+        Purpose: Capture loop, pushes (seq, timestamp, frame) into the ring buffer.
+        """
+        def run(self):
+                while self.running:
+                        ret, frame = self.cap.read()
+                        stamp = time.time()
+                        if not ret:
+                                if not self.cap.isOpened():
+                                        break
+                                time.sleep(0.005)
+                                continue
+                        with self.lock:
+                                self.frames_captured += 1
+                                self.ring.append((self.frames_captured, stamp, frame))
+                                self.lock.notify_all()
+                with self.lock:
+                        self.running = False
+                        self.lock.notify_all()
+
+        """
+        Function Name : latest()
+        Input: timeout (seconds to wait for a frame newer than the last one read,
+               None waits forever, 0 does not wait)
+        Output: frame, timestamp (None, None if no new frame arrived)
+        Purpose: Returns the newest frame in the ring and counts the frames that
+                 were skipped since the previous call.
+        """
+        def latest(self, timeout=None):
+                with self.lock:
+                        fresh = lambda: self.ring and self.ring[-1][0] > self.last_seq
+                        if not self.lock.wait_for(lambda: fresh() or not self.running, timeout):
+                                return None, None
+                        if not fresh():
+                                return None, None
+                        seq, stamp, frame = self.ring[-1]
+                        if self.last_seq:
+                                self.frames_dropped += seq - self.last_seq - 1
+                        self.last_seq = seq
+                        return frame, stamp
+
+        """
+        Function Name : read()
+        Input: timeout (optional)
+        Output: ret, frame
+        Purpose: Same return values as cv2.VideoCapture.read(), so the grabber can
+                 replace cap in the existing loops.
+        """
+        def read(self, timeout=None):
+                frame, _ = self.latest(timeout)
+                return frame is not None, frame
+
+        """
+        Function Name : release()
+        Input: None
+        Output: None
+        Purpose: Stops the capture thread and releases the camera.
+        """
+        def release(self):
+                self.running = False
+                if self.thread is not None:
+                        self.thread.join()
+                        self.thread = None
+                self.cap.release()
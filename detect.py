@@ -2,6 +2,9 @@ import numpy as np
 import cv2
 import cv2.aruco as aruco
 import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from scene import axis_model, cube_model, cylinder_model, draw_models, draw_markers
 """
 **************************************************************************
 *                  E-Yantra Robotics Competition
@@ -69,51 +72,530 @@ def cos(angle):
 ################################################################################
 
 
+"""
+Function Name : copy_parameters()
+Input: parameters (aruco DetectorParameters)
+Output: a new DetectorParameters with the same settings
+"""
+def copy_parameters(parameters):
+        copy = aruco.DetectorParameters_create()
+        for name in dir(parameters):
+                value = getattr(parameters, name)
+                if not name.startswith('_') and not callable(value):
+                        setattr(copy, name, value)
+        return copy
+
+"""
+PROFILE_FILE
+DetectorParameters profile written by tune_detector.py, next to detect.py. It
+is only used where it is asked for (profile argument of MarkerDetector and
+detect_markers(), --profile of the tools, DETECTOR_PROFILE of opengl_final.py).
+"""
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'detector_profile.npz')
+
+"""
+Function Name : save_profile()
+Input: path, parameters (aruco DetectorParameters), names of the settings
+Output: None
+Purpose: Saves the named settings of the parameters to an .npz profile.
+"""
+def save_profile(path, parameters, names):
+        np.savez(path, **dict((name, getattr(parameters, name)) for name in names))
+
+"""
+Function Name : load_profile()
+Input: path, parameters (aruco DetectorParameters, changed in place)
+Output: parameters
+Purpose: Applies the settings saved by save_profile() and says so, a profile
+         changes which markers are found.
+"""
+def load_profile(path, parameters):
+        with np.load(path) as X:
+                for name in X.files:
+                        setattr(parameters, name, X[name].item())
+                print('detector profile %s applied: %s' % (path, ', '.join('%s=%s' % (name, X[name].item())
+                                                                             for name in X.files)))
+        return parameters
+
+"""
+Function Name : save_dictionary()
+Input: path, aruco_dict (aruco Dictionary), ids (marker id of each entry)
+Output: None
+Purpose: Saves a custom dictionary made by marker_dictionary.py to an .npz file.
+"""
+def save_dictionary(path, aruco_dict, ids):
+        np.savez(path, bytesList=aruco_dict.bytesList, markerSize=aruco_dict.markerSize,
+                 maxCorrectionBits=aruco_dict.maxCorrectionBits, ids=np.asarray(ids, np.int32))
+
+"""
+Function Name : load_dictionary()
+Input: dictionary (predefined ArUco dictionary id, aruco Dictionary or path of
+       a file saved by save_dictionary())
+Output: aruco Dictionary, ids (marker id of each entry, None when the entry
+        index is the id)
+"""
+def load_dictionary(dictionary):
+        if isinstance(dictionary, str):
+                with np.load(dictionary) as X:
+                        aruco_dict = aruco.Dictionary_create(1, int(X['markerSize']))
+                        aruco_dict.bytesList = X['bytesList']
+                        aruco_dict.maxCorrectionBits = int(X['maxCorrectionBits'])
+                        return aruco_dict, X['ids']
+        if isinstance(dictionary, int):
+                return aruco.Dictionary_get(dictionary), None
+        return dictionary, None
+
+"""
+MARKER_DTYPE
+One record per detected marker: id, centre (x, y), the four corners in image
+coordinates and the pose vectors in the (1,1,3) shape the aruco list uses.
+"""
+MARKER_DTYPE = np.dtype([('id', np.int32),
+                         ('centre', np.float32, (2,)),
+                         ('corners', np.float32, (4,2)),
+                         ('rvec', np.float64, (1,1,3)),
+                         ('tvec', np.float64, (1,1,3))])
+
+"""
+Function Name : make_marker_table()
+Input: ids (N,), corners (N,4,2), rvec (N,1,3), tvec (N,1,3)
+Output: marker table (numpy record array of MARKER_DTYPE)
+Purpose: Fills the marker table for all markers at once. The centre is the mean
+         of the four corners, as in the aruco list.
+"""
+def make_marker_table(ids, corners, rvec, tvec):
+        table = np.zeros(len(ids), dtype=MARKER_DTYPE).view(np.recarray)
+        if len(ids) == 0:
+                return table
+        corners = np.asarray(corners, dtype=np.float32).reshape(-1,4,2)
+        table.id = np.asarray(ids).reshape(-1)
+        table.corners = corners
+        table.centre = corners.sum(axis=1)/4
+        table.rvec = np.asarray(rvec).reshape(-1,1,1,3)
+        table.tvec = np.asarray(tvec).reshape(-1,1,1,3)
+        return table
+
+"""
+Class Name : MarkerList
+Input: markers (aruco list entries)
+Purpose: The aruco list with an index from marker id to its entry (by_id), so
+         consumers look a marker up directly instead of scanning the list. It is
+         still a plain list of (aruco_id, centre, rvec, tvec) tuples. If an id
+         appears twice the last entry is indexed.
+"""
+class MarkerList(list):
+        def __init__(self, markers=()):
+                list.__init__(self, markers)
+                self.by_id = dict((x[0], x) for x in self)
+
+"""
+Function Name : marker_index()
+Input: aruco list (MarkerList or a plain list)
+Output: dict of aruco_id to (aruco_id, centre, rvec, tvec)
+"""
+def marker_index(ar_list):
+        if isinstance(ar_list, MarkerList):
+                return ar_list.by_id
+        return dict((x[0], x) for x in ar_list)
+
+"""
+Function Name : table_to_list()
+Input: marker table
+Output: aruco list (MarkerList) in the form [(aruco_id_1, centre_1, rvec_1, tvec_1), ...]
+Purpose: Gives the marker table in the prescribed aruco list format. rvec and tvec
+         are views into the table, nothing is copied.
+"""
+def table_to_list(table):
+        centre, rvec, tvec = table['centre'], table['rvec'], table['tvec']
+        return MarkerList((int(table['id'][j]), (centre[j][0], centre[j][1]), rvec[j], tvec[j])
+                          for j in range(len(table)))
+
+"""
+Class Name : MarkerDetector
+Input: camera_matrix, dist_coeff (loaded from Camera.npz if not given),
+       marker_length, dictionary (predefined ArUco dictionary id or a custom
+       dictionary file, see load_dictionary()), scale (size
+       of the image the markers are searched in, 1.0 is full resolution),
+       profile (path of a DetectorParameters profile to apply, e.g.
+       PROFILE_FILE, none by default)
+Purpose: Holds everything detect_markers() needs across frames. The dictionary,
+         detector parameters and calibration are set up once when the object is
+         created, so each call to detect() only converts the frame to gray, runs a
+         single detection pass and estimates the poses.
+         With scale below 1.0 the candidate search runs on a downscaled copy of
+         the frame and the corners are refined on the full resolution image
+         before the pose is estimated.
+"""
+class MarkerDetector:
+        def __init__(self, camera_matrix=None, dist_coeff=None, marker_length=100,
+                     dictionary=aruco.DICT_5X5_250, scale=1.0, profile=None):
+                if camera_matrix is None or dist_coeff is None:
+                        camera_matrix, dist_coeff = getCameraMatrix()
+                self.camera_matrix = camera_matrix
+                self.dist_coeff = dist_coeff
+                self.marker_length = marker_length
+                self.aruco_dict, self.marker_ids = load_dictionary(dictionary)
+                self.dictionary = dictionary
+                self.parameters = aruco.DetectorParameters_create()
+                self.profile = profile
+                if profile is not None:
+                        load_profile(profile, self.parameters)
+                self.scale = scale
+                self.subpix_criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+
+        """
+        Function Name : uses()
+        Input: camera_matrix, dist_coeff
+        Output: True if this detector was built for the given calibration
+        """
+        def uses(self, camera_matrix, dist_coeff):
+                return (np.array_equal(self.camera_matrix, camera_matrix) and
+                        np.array_equal(self.dist_coeff, dist_coeff))
+
+        """
+        Function Name : find_corners()
+        Input: gray (numpy array), parameters (optional, defaults to the
+               detector's own)
+        Output: corners (N,4,2 float32), ids (N,)
+        Purpose: Runs one ArUco detection pass over the gray image, at the
+                 detector's scale. With a custom dictionary the entry indices
+                 are mapped back to the marker ids.
+        """
+        def find_corners(self, gray, parameters=None):
+                if parameters is None:
+                        parameters = self.parameters
+                if self.scale == 1.0:
+                        small = gray
+                else:
+                        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                                           interpolation=cv2.INTER_AREA)
+                corners, ids, _ = aruco.detectMarkers(small, self.aruco_dict, parameters = parameters)
+                if ids is None:
+                        return np.zeros((0,4,2), np.float32), np.zeros(0, np.int32)
+                corners = np.array(corners, dtype=np.float32).reshape(-1,4,2)
+                if self.scale != 1.0:
+                        corners = self.refine_corners(gray, corners)
+                ids = ids.reshape(-1)
+                if self.marker_ids is not None:
+                        ids = self.marker_ids[ids]
+                return corners, ids
+
+        """
+        Function Name : refine_corners()
+        Input: gray (full resolution), corners (N,4,2) found at scale (self.scale
+               if None)
+        Output: corners (N,4,2) in full resolution coordinates
+        Purpose: Maps the corners back up to the full image and refines them to
+                 sub-pixel accuracy there.
+        """
+        def refine_corners(self, gray, corners, scale=None):
+                scale = self.scale if scale is None else scale
+                corners = (corners + 0.5)/scale - 0.5
+                win = int(math.ceil(1.0/scale)) + 2
+                cv2.cornerSubPix(gray, corners.reshape(-1,1,2), (win,win), (-1,-1), self.subpix_criteria)
+                return corners
+
+        """
+        Function Name : estimate_table()
+        Input: corners (N,4,2), ids (N,)
+        Output: marker table
+        Purpose: Estimates the pose of every marker in one call and fills the table.
+        """
+        def estimate_table(self, corners, ids):
+                if len(ids) == 0:
+                        return make_marker_table(ids, corners, [], [])
+                rvec, tvec, _ = aruco.estimatePoseSingleMarkers(corners.reshape(-1,1,4,2), self.marker_length,
+                                                                self.camera_matrix, self.dist_coeff)
+                return make_marker_table(ids, corners, rvec, tvec)
+
+        """
+        Function Name : detect_table()
+        Input: img (numpy array, BGR or already gray)
+        Output: marker table (numpy record array of MARKER_DTYPE)
+        Purpose: Detects the ArUco markers in the image and estimates their pose
+                 with the stored calibration.
+        """
+        def detect_table(self, img):
+                if img.ndim == 3:
+                        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                else:
+                        gray = img
+                corners, ids = self.find_corners(gray)
+                return self.estimate_table(corners, ids)
+
+        """
+        Function Name : detect()
+        Input: img (numpy array, BGR or already gray)
+        Output: aruco list in the form [(aruco_id_1, centre_1, rvec_1, tvec_1), ...]
+        """
+        def detect(self, img):
+                return table_to_list(self.detect_table(img))
+
+"""
+Function Name : tile_boxes()
+Input: shape of the image, tiles (columns, rows), overlap in pixels
+Output: list of (x0, y0, x1, y1) tiles covering the image
+Purpose: Splits the image into a grid of tiles that overlap by the given
+         number of pixels, so any marker whose bounding box is no wider and
+         no higher than the overlap lies completely inside at least one tile.
+         Raises ValueError when the overlap is not smaller than the grid
+         cells, tiling could not help then.
+"""
+def tile_boxes(shape, tiles, overlap):
+        h, w = shape[:2]
+        if overlap >= min(w//tiles[0], h//tiles[1]):
+                raise ValueError('overlap of %d px does not fit %dx%d tiles of a %dx%d image, use fewer tiles '
+                                 'or a smaller max_marker' % (overlap, tiles[0], tiles[1], w, h))
+        boxes = []
+        xs = np.linspace(0, w, tiles[0]+1).astype(int)
+        ys = np.linspace(0, h, tiles[1]+1).astype(int)
+        for j in range(tiles[1]):
+                for i in range(tiles[0]):
+                        boxes.append((max(xs[i] - overlap//2, 0), max(ys[j] - overlap//2, 0),
+                                      min(xs[i+1] + overlap//2, w), min(ys[j+1] + overlap//2, h)))
+        return boxes
+
+"""
+Function Name : merge_detections()
+Input: list of (corners (N,4,2), ids (N,)) from the tiles
+Output: corners (M,4,2), ids (M,)
+Purpose: Drops the copies of a marker that was found in more than one tile. Two
+         detections are the same marker when they have the same id and their
+         centres are less than half a marker side apart. The larger one is kept:
+         when the outer edge of a marker touches a tile border, the tile can
+         report the inner contour of the same marker instead.
+"""
+def merge_detections(found):
+        keep_corners, keep_ids, keep_area = [], [], []
+        for corners, ids in found:
+                for j in range(len(ids)):
+                        area = cv2.contourArea(corners[j])
+                        centre = corners[j].mean(axis=0)
+                        for k in range(len(keep_ids)):
+                                if keep_ids[k] == ids[j] and \
+                                   np.linalg.norm(keep_corners[k].mean(axis=0) - centre) < 0.5*math.sqrt(min(area, keep_area[k])):
+                                        if area > keep_area[k]:
+                                                keep_corners[k], keep_area[k] = corners[j], area
+                                        break
+                        else:
+                                keep_corners.append(corners[j])
+                                keep_ids.append(ids[j])
+                                keep_area.append(area)
+        if not keep_ids:
+                return np.zeros((0,4,2), np.float32), np.zeros(0, np.int32)
+        return np.array(keep_corners, np.float32), np.array(keep_ids, np.int32)
+
+"""
+TILE_MARGIN
+Pixels of white border kept around a marker inside its tile, on each side.
+LARGE_MARKER_SIDE
+Side in pixels that the smallest marker of the downscaled full frame pass of
+TiledDetector keeps, enough to find its outline.
+MIN_TILE
+Smallest part of a tile outside the overlap, in pixels. Frames too small for
+two such tiles along an axis are not split along it.
+"""
+TILE_MARGIN = 8
+LARGE_MARKER_SIDE = 80.0
+MIN_TILE = 400
+
+"""
+Class Name : TiledDetector
+Input: same as MarkerDetector, plus tiles (most columns, rows), max_marker
+       (side in pixels of the largest marker searched for in the tiles),
+       min_tile (see MIN_TILE) and workers (threads)
+Purpose: For high resolution cameras. The gray frame is split into overlapping
+         tiles that are detected in parallel on a thread pool (OpenCV releases
+         the GIL), and the detections in the overlap bands are merged. The
+         overlap is derived from max_marker: a marker up to that size, at any
+         rotation, lies completely inside at least one tile. The perimeter
+         limits are rescaled for each tile so that the same markers are
+         accepted as in a single full frame pass, and capped at max_marker.
+         Larger markers are looked for in one more pass over the whole frame,
+         downscaled so that they are still LARGE_MARKER_SIDE pixels or more.
+         Every outline found there, decoded or not, is detected again at full
+         resolution in a box around it, so its corners are those of the
+         single pass. A frame that is not larger than one tile plus the
+         overlap is detected in a single pass.
+"""
+class TiledDetector(MarkerDetector):
+        def __init__(self, *args, tiles=(2,2), max_marker=100, min_tile=MIN_TILE, workers=None, **kwargs):
+                MarkerDetector.__init__(self, *args, **kwargs)
+                self.tiles = tiles
+                self.max_marker = max_marker
+                # bounding box of the marker at 45 degrees, and a margin for
+                # the white border around it on both sides
+                self.overlap = int(math.ceil(max_marker*math.sqrt(2))) + 2*TILE_MARGIN
+                self.min_tile = max(min_tile, self.overlap + 1)
+                self.large_scale = min(self.scale, LARGE_MARKER_SIDE/float(max_marker))
+                self.pool = ThreadPoolExecutor(max_workers=workers or tiles[0]*tiles[1] + 1)
+                self.tile_parameters = {}
+
+        """
+        Function Name : grid()
+        Input: image shape
+        Output: (columns, rows) the image is split into, at most self.tiles
+        """
+        def grid(self, shape):
+                h, w = shape[:2]
+                return (min(self.tiles[0], max(1, (w - self.overlap)//self.min_tile)),
+                        min(self.tiles[1], max(1, (h - self.overlap)//self.min_tile)))
+
+        """
+        Function Name : parameters_for()
+        Input: full image shape, box shape, parameters (of the full frame, the
+               detector's own if None), cap (limit the perimeter to max_marker)
+        Output: DetectorParameters for a box cut out of the image
+        Purpose: Perimeter rates are relative to the image size, so they are
+                 scaled to keep the same limits in pixels as the full frame.
+        """
+        def parameters_for(self, shape, box_shape, parameters=None, cap=True):
+                # only the few tile shapes are kept, boxes differ every frame
+                key = (shape[:2], box_shape[:2])
+                cached = parameters is None and cap
+                if cached and key in self.tile_parameters:
+                        return self.tile_parameters[key]
+                base = self.parameters if parameters is None else parameters
+                box = copy_parameters(base)
+                ratio = float(max(shape[:2]))/max(box_shape[:2])
+                box.minMarkerPerimeterRate = base.minMarkerPerimeterRate*ratio
+                box.maxMarkerPerimeterRate = base.maxMarkerPerimeterRate*ratio
+                if cap:
+                        box.maxMarkerPerimeterRate = min(box.maxMarkerPerimeterRate,
+                                                         4.0*self.max_marker/max(box_shape[:2]))
+                if cached:
+                        self.tile_parameters[key] = box
+                return box
+
+        """
+        Function Name : find_in_box()
+        Input: gray, box (x0, y0, x1, y1), parameters for the box
+        Output: corners (N,4,2) in full image coordinates, ids (N,)
+        Purpose: Markers touching an edge of the box inside the image are cut
+                 by it and dropped. Up to max_marker they lie with a margin in
+                 another tile, larger ones are left to find_large().
+        """
+        def find_in_box(self, gray, box, parameters):
+                x0, y0, x1, y1 = box
+                corners, ids = MarkerDetector.find_corners(self, gray[y0:y1, x0:x1], parameters)
+                edge = TILE_MARGIN/2.0
+                cut = np.zeros(len(ids), bool)
+                if x0 > 0:
+                        cut |= (corners[:,:,0] < edge).any(axis=1)
+                if y0 > 0:
+                        cut |= (corners[:,:,1] < edge).any(axis=1)
+                if x1 < gray.shape[1]:
+                        cut |= (corners[:,:,0] > x1 - x0 - 1 - edge).any(axis=1)
+                if y1 < gray.shape[0]:
+                        cut |= (corners[:,:,1] > y1 - y0 - 1 - edge).any(axis=1)
+                corners, ids = corners[~cut], ids[~cut]
+                corners += np.float32([x0, y0])
+                return corners, ids
+
+        """
+        Function Name : find_large()
+        Input: gray, parameters (of the full frame, the detector's own if None)
+        Output: list of (corners (N,4,2), ids (N,)) of the boxes around the
+                outlines above max_marker
+        Purpose: Only the outlines are taken from the downscaled frame, small
+                 markers often decode there differently than at full
+                 resolution. Each one is detected again at full size in a box
+                 padded by a quarter of its side and the largest adaptive
+                 threshold window, with the full frame perimeter limits.
+        """
+        def find_large(self, gray, parameters=None):
+                base = self.parameters if parameters is None else parameters
+                large = copy_parameters(base)
+                large.minMarkerPerimeterRate = max(base.minMarkerPerimeterRate, 0.9*4.0*self.max_marker/max(gray.shape[:2]))
+                if large.minMarkerPerimeterRate >= large.maxMarkerPerimeterRate:
+                        return []
+                small = cv2.resize(gray, None, fx=self.large_scale, fy=self.large_scale, interpolation=cv2.INTER_AREA)
+                corners, _, rejected = aruco.detectMarkers(small, self.aruco_dict, parameters = large)
+                outlines = list(corners) + list(rejected)
+                found = []
+                h, w = gray.shape[:2]
+                for outline in outlines:
+                        outline = (np.float32(outline).reshape(4,2) + 0.5)/self.large_scale - 0.5
+                        pad = 0.25*np.linalg.norm(outline[0] - outline[2]) + base.adaptiveThreshWinSizeMax + TILE_MARGIN
+                        x0, y0 = np.maximum(np.floor(outline.min(axis=0) - pad).astype(int), 0)
+                        x1, y1 = np.minimum(np.ceil(outline.max(axis=0) + pad).astype(int) + 1, [w, h])
+                        box = (x0, y0, x1, y1)
+                        found.append(self.find_in_box(gray, box, self.parameters_for(gray.shape, (y1 - y0, x1 - x0),
+                                                                                     parameters, cap=False)))
+                return found
+
+        """
+        Function Name : single_pass_ok()
+        Input: gray, corners (N,4,2), ids (N,), parameters of the full frame
+        Output: bool (N,), False for the detections a single pass over the
+                whole frame would reject
+        Purpose: The perimeter limits and the distance to the image border are
+                 checked against the whole frame, a box can accept markers
+                 the full frame does not.
+        """
+        def single_pass_ok(self, gray, corners, ids, parameters):
+                h, w = gray.shape[:2]
+                perimeters = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2).sum(axis=1)
+                size = float(max(h, w))
+                border = parameters.minDistanceToBorder
+                return ((perimeters >= parameters.minMarkerPerimeterRate*size) &
+                        (perimeters <= parameters.maxMarkerPerimeterRate*size) &
+                        (corners[:,:,0] >= border).all(axis=1) & (corners[:,:,0] < w - border).all(axis=1) &
+                        (corners[:,:,1] >= border).all(axis=1) & (corners[:,:,1] < h - border).all(axis=1))
+
+        """
+        Function Name : find_corners()
+        Input: gray (numpy array), parameters (optional, defaults to the
+               detector's own)
+        Output: corners (N,4,2), ids (N,)
+        Purpose: Detects all tiles and the large markers in parallel and merges
+                 the results.
+        """
+        def find_corners(self, gray, parameters=None):
+                grid = self.grid(gray.shape)
+                if grid == (1, 1):
+                        return MarkerDetector.find_corners(self, gray, parameters)
+                boxes = tile_boxes(gray.shape, grid, self.overlap)
+                large = self.pool.submit(self.find_large, gray, parameters)
+                found = list(self.pool.map(lambda box: self.find_in_box(
+                        gray, box, self.parameters_for(gray.shape, (box[3] - box[1], box[2] - box[0]), parameters)),
+                        boxes))
+                corners, ids = merge_detections(found + large.result())
+                keep = self.single_pass_ok(gray, corners, ids, self.parameters if parameters is None else parameters)
+                return corners[keep], ids[keep]
+
+
+detector = None
+
 """
 Function Name : detect_markers()
-Input: img (numpy array), camera_matrix, dist_coeff
+Input: img (numpy array), camera_matrix, dist_coeff, as_table, scale, dictionary,
+       profile (optional)
 Output: aruco list in the form [(aruco_id_1, centre_1, rvec_1, tvec_1),(aruco_id_2,
         centre_2, rvec_2, tvec_2), ()....]
 Purpose: This function takes the image in form of a numpy array, camera_matrix and
          distortion matrix as input and detects ArUco markers in the image. For each
          ArUco marker detected in image, paramters such as ID, centre coord, rvec
          and tvec are calculated and stored in a list in a prescribed format. The list
-         is returned as output for the function
-"""
-def detect_markers(img, camera_matrix, dist_coeff):
-        markerLength = 100
-        aruco_list = []
-        ######################## INSERT CODE HERE ########################
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        aruco_dict = aruco.Dictionary_get(aruco.DICT_5X5_250)
-        
-        parameters = aruco.DetectorParameters_create()
-        corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-        
-        with np.load('C:\\Users\\Pradipta Ray\\Desktop\\Task 0\\Task 0.2\\Camera.npz') as X:
-              camera_matrix, dist_coeff, _, _ = [X[i] for i in ('mtx','dist','rvecs','tvecs')]
-              corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-              rvec, tvec,_= aruco.estimatePoseSingleMarkers(corners, markerLength, camera_matrix, dist_coeff)
-              
-              j=0
-              for i in ids:
-                     
-                      
-                      Xc=(corners[j][0][0][0]+corners[j][0][1][0]+corners[j][0][2][0]+corners[j][0][3][0])/4
-                      Yc=(corners[j][0][0][1]+corners[j][0][1][1]+corners[j][0][2][1]+corners[j][0][3][1])/4
-                      aruco_centre=(Xc,Yc)
-    
-                      rvect = np.array([rvec[j].reshape(1,1,3)])
-                      tvect = np.array([tvec[j].reshape(1,1,3)])
-                      tup1 = (int(i),aruco_centre,rvect[0],tvect[0])
-                      aruco_list.append(tup1)
-                      j=j+1
-              print(aruco_list)
-   
-        ##################################################################
-        
-              return aruco_list
+         is returned as output for the function. A MarkerDetector is kept between
+         calls and only rebuilt when the calibration passed in changes. With
+         as_table=True the marker table (MARKER_DTYPE record array) is returned
+         instead of the list. scale below 1.0 searches for the markers in a
+         downscaled image (see MarkerDetector). dictionary is a predefined ArUco
+         dictionary id or a custom dictionary file from marker_dictionary.py.
+         profile is a DetectorParameters profile file to apply (see
+         PROFILE_FILE), the aruco defaults are used without it.
+"""
+def detect_markers(img, camera_matrix, dist_coeff, as_table=False, scale=1.0,
+                   dictionary=aruco.DICT_5X5_250, profile=None):
+        global detector
+        if (detector is None or not detector.uses(camera_matrix, dist_coeff)
+            or detector.scale != scale or detector.dictionary != dictionary or detector.profile != profile):
+                detector = MarkerDetector(camera_matrix, dist_coeff, scale=scale, dictionary=dictionary,
+                                          profile=profile)
+        if as_table:
+                return detector.detect_table(img)
+        return detector.detect(img)
 
 """
 Function Name : drawAxis()
@@ -121,26 +603,11 @@ Input: img (numpy array), aruco_list, aruco_id, camera_matrix, dist_coeff
 Output: img (numpy array)
 Purpose: This function takes the above specified outputs and draws 3 mutually
          perpendicular axes on the specified aruco marker in the image and
-         returns the modified image.
+         returns the modified image. The geometry is scene.axis_model().
 """
 def drawAxis(img, aruco_list, aruco_id, camera_matrix, dist_coeff):
-        for x in aruco_list:
-                if aruco_id == x[0]:
-                        rvec, tvec = x[2], x[3]
-        markerLength = 100
-        m = markerLength/2
-        pts = np.float32([[-m,m,0],[m,m,0],[-m,-m,0],[-m,m,m]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        
-        img = cv2.line(img, src, dst1, (0,255,0), 4)
-        img = cv2.line(img, src, dst2, (255,0,0), 4)
-        img = cv2.line(img, src, dst3, (0,0,255), 4)
-        return img
+        rvec, tvec = marker_index(aruco_list)[aruco_id][2:4]
+        return draw_models(img, [(axis_model(), rvec, tvec)], camera_matrix, dist_coeff)
 
 """
 Function Name : drawCube()
@@ -148,336 +615,30 @@ Input: img (numpy array), aruco_list, aruco_id, camera_matrix, dist_coeff
 Output: img (numpy array)
 Purpose: This function takes the above specified outputs and draws a cube
          on the specified aruco marker in the image and returns the modified
-         image.
+         image. The geometry is scene.cube_model().
 """
 def drawCube(img, ar_list, ar_id, camera_matrix, dist_coeff):
-        for x in ar_list:
-                if ar_id == x[0]:
-                        rvec, tvec = x[2], x[3]
-        markerLength = 100
-        m = markerLength/2
-        ######################## INSERT CODE HERE ########################
-        pts = np.float32([[-m,m,0],[m,m,0],[-m,-m,0],[-m,m,m]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        
-        img = cv2.line(img, src, dst1, (0,0,255), 4)
-        img = cv2.line(img, src, dst2, (0,0,255), 4)
-        img = cv2.line(img, src, dst3, (0,0,255), 4)
-        pts = np.float32([[m,-m,0],[m,m,0],[-m,-m,0],[m,-m,m]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        
-        img = cv2.line(img, src, dst1, (0,0,255), 4)
-        img = cv2.line(img, src, dst2, (0,0,255), 4)
-        img = cv2.line(img, src, dst3, (0,0,255), 4)
-        pts = np.float32([[m,m,m],[m,-m,m],[-m,m,m],[m,m,0]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        
-        img = cv2.line(img, src, dst1, (0,0,255), 4)
-        img = cv2.line(img, src, dst2, (0,0,255), 4)
-        img = cv2.line(img, src, dst3, (0,0,255), 4)
-        pts = np.float32([[-m,-m,m],[-m,m,m],[m,-m,m],[-m,-m,0]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        
-        img = cv2.line(img, src, dst1, (0,0,255), 4)
-        img = cv2.line(img, src, dst2, (0,0,255), 4)
-        img = cv2.line(img, src, dst3, (0,0,255), 4)
-
-        
-        ##################################################################
-        return img
+        rvec, tvec = marker_index(ar_list)[ar_id][2:4]
+        return draw_models(img, [(cube_model(), rvec, tvec)], camera_matrix, dist_coeff)
 
 """
 Function Name : drawCylinder()
-Input: img (numpy array), aruco_list, aruco_id, camera_matrix, dist_coeff
+Input: img (numpy array), aruco_list, aruco_id, camera_matrix, dist_coeff,
+       segments (optional, sides of the rims)
 Output: img (numpy array)
 Purpose: This function takes the above specified outputs and draws a cylinder
          on the specified aruco marker in the image and returns the modified
-         image.
-"""
-def drawCylinder(img, ar_list, ar_id, camera_matrix, dist_coeff):
-        for x in ar_list:
-                if ar_id == x[0]:
-                        rvec, tvec = x[2], x[3]
-        markerLength = 100
-        radius = markerLength/2; height = markerLength*1.5
-        m=radius
-        h=height
-        ######################## INSERT CODE HERE ########################
-        pts = np.float32([[0,0,0],[0,m,0],[m*cos(60),m*sin(60),0],[m*cos(30),m*sin(30),0],[m,0,0],[m*cos(60),-m*sin(60),0],[m*cos(30),-m*sin(30),0],[0,-m,0],[-m*cos(60),-m*sin(60),0],[-m*cos(30),-m*sin(30),0],[-m,0,0],[-m*cos(60),m*sin(60),0],[-m*cos(30),m*sin(30),0]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        dst4 = pt_dict[tuple(pts[4])]; dst5 = pt_dict[tuple(pts[5])];
-        dst6 = pt_dict[tuple(pts[6])];  dst7 = pt_dict[tuple(pts[7])];
-        dst8 = pt_dict[tuple(pts[8])]; dst9 = pt_dict[tuple(pts[9])];
-        dst10 = pt_dict[tuple(pts[10])];  dst11 = pt_dict[tuple(pts[11])];
-        dst12 = pt_dict[tuple(pts[12])];
-        
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-        img = cv2.line(img, src, dst2, (255,0,0), 4)
-        img = cv2.line(img, src, dst3, (255,0,0), 4)
-        img = cv2.line(img, src, dst4, (255,0,0), 4)
-        
-        img = cv2.line(img, src, dst5, (255,0,0), 4)
-        img = cv2.line(img, src, dst6, (255,0,0), 4)
-        img = cv2.line(img, src, dst7, (255,0,0), 4)
-        img = cv2.line(img, src, dst8, (255,0,0), 4)
-
-        img = cv2.line(img, src, dst9, (255,0,0), 4)
-        img = cv2.line(img, src, dst10, (255,0,0), 4)
-        
-        img = cv2.line(img, src, dst11, (255,0,0), 4)
-        img = cv2.line(img, src, dst12, (255,0,0), 4)
-
-        pts = np.float32([[0,0,h],[0,m,h],[m*cos(60),m*sin(60),h],[m*cos(30),m*sin(30),h],[m,0,h],[m*cos(60),-m*sin(60),h],[m*cos(30),-m*sin(30),h],[0,-m,h],[-m*cos(60),-m*sin(60),h],[-m*cos(30),-m*sin(30),h],[-m,0,h],[-m*cos(60),m*sin(60),h],[-m*cos(30),m*sin(30),h],[0,0,0]])
-        pt_dict = {}
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-        dst2 = pt_dict[tuple(pts[2])];  dst3 = pt_dict[tuple(pts[3])];
-        dst4 = pt_dict[tuple(pts[4])]; dst5 = pt_dict[tuple(pts[5])];
-        dst6 = pt_dict[tuple(pts[6])];  dst7 = pt_dict[tuple(pts[7])];
-        dst8 = pt_dict[tuple(pts[8])]; dst9 = pt_dict[tuple(pts[9])];
-        dst10 = pt_dict[tuple(pts[10])];  dst11 = pt_dict[tuple(pts[11])];
-        dst12 = pt_dict[tuple(pts[12])];
-        dst13 = pt_dict[tuple(pts[13])];
-        
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-        img = cv2.line(img, src, dst2, (255,0,0), 4)
-        img = cv2.line(img, src, dst3, (255,0,0), 4)
-        img = cv2.line(img, src, dst4, (255,0,0), 4)
-        
-        img = cv2.line(img, src, dst5, (255,0,0), 4)
-        img = cv2.line(img, src, dst6, (255,0,0), 4)
-        img = cv2.line(img, src, dst7, (255,0,0), 4)
-        img = cv2.line(img, src, dst8, (255,0,0), 4)
-
-        img = cv2.line(img, src, dst9, (255,0,0), 4)
-        img = cv2.line(img, src, dst10, (255,0,0), 4)
-        
-        img = cv2.line(img, src, dst11, (255,0,0), 4)
-        img = cv2.line(img, src, dst12, (255,0,0), 4)
-        img = cv2.line(img, src, dst13, (255,0,0), 4)
-
-        pts = np.float32([[0,m,0],[0,m,h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-
-
-        pts = np.float32([[m,0,0],[m,0,h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[0,-m,0],[0,-m,h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-
-        pts = np.float32([[-m,0,0],[-m,0,h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[m*cos(60),m*sin(60),0],[m*cos(60),m*sin(60),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[m*cos(30),m*sin(30),0],[m*cos(30),m*sin(30),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[m*cos(30),-m*sin(30),0],[m*cos(30),-m*sin(30),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[m*cos(60),-m*sin(60),0],[m*cos(60),-m*sin(60),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-
-        pts = np.float32([[-m*cos(60),-m*sin(60),0],[-m*cos(60),-m*sin(60),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-
-        pts = np.float32([[-m*cos(30),-m*sin(30),0],[-m*cos(30),-m*sin(30),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[-m*cos(30),m*sin(30),0],[-m*cos(30),m*sin(30),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-
-        pts = np.float32([[-m*cos(60),m*sin(60),0],[-m*cos(60),m*sin(60),h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        src = pt_dict[tuple(pts[0])];   dst1 = pt_dict[tuple(pts[1])];
-
-        img = cv2.line(img, src, dst1, (255,0,0), 4)
-
-        pts = np.float32([[0,m,0],[m*cos(60),m*sin(60),0],[m*cos(30),m*sin(30),0],[m,0,0],[m*cos(30),-m*sin(30),0],[m*cos(60),-m*sin(60),0],[0,-m,0],[-m*cos(60),-m*sin(60),0],[-m*cos(30),-m*sin(30),0],[-m,0,0],[-m*cos(30),m*sin(30),0],[-m*cos(60),m*sin(60),0],[0,m,0]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        dist0 = pt_dict[tuple(pts[0])];   dist1 = pt_dict[tuple(pts[1])];
-        dist2 = pt_dict[tuple(pts[2])];
-        dist3 = pt_dict[tuple(pts[3])];
-        dist4 = pt_dict[tuple(pts[4])];
-        dist5 = pt_dict[tuple(pts[5])];
-        dist6 = pt_dict[tuple(pts[6])];
-        dist7 = pt_dict[tuple(pts[7])];
-        dist8 = pt_dict[tuple(pts[8])];
-        dist9 = pt_dict[tuple(pts[9])];
-        dist10 = pt_dict[tuple(pts[10])];
-        dist11 = pt_dict[tuple(pts[11])];
-        L=[[dist0,dist1,dist2,dist3,dist4,dist5,dist6,dist7,dist8,dist9,dist10,dist11]]
-        ctr = [np.array(L).astype(np.int32)]
-        img = cv2.drawContours(img, ctr, -1, (255,0,0), 4)
-        pts = np.float32([[0,m,h],[m*cos(60),m*sin(60),h],[m*cos(30),m*sin(30),h],[m,0,h],[m*cos(30),-m*sin(30),h],[m*cos(60),-m*sin(60),h],[0,-m,h],[-m*cos(60),-m*sin(60),h],[-m*cos(30),-m*sin(30),h],[-m,0,h],[-m*cos(30),m*sin(30),h],[-m*cos(60),m*sin(60),h],[0,m,h]])
-        pt_dict = {}
-                      
-              
-        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, camera_matrix, dist_coeff)
-        for i in range(len(pts)):
-                 pt_dict[tuple(pts[i])] = tuple(imgpts[i].ravel())
-        dist0 = pt_dict[tuple(pts[0])];   dist1 = pt_dict[tuple(pts[1])];
-        dist2 = pt_dict[tuple(pts[2])];
-        dist3 = pt_dict[tuple(pts[3])];
-        dist4 = pt_dict[tuple(pts[4])];
-        dist5 = pt_dict[tuple(pts[5])];
-        dist6 = pt_dict[tuple(pts[6])];
-        dist7 = pt_dict[tuple(pts[7])];
-        dist8 = pt_dict[tuple(pts[8])];
-        dist9 = pt_dict[tuple(pts[9])];
-        dist10 = pt_dict[tuple(pts[10])];
-        dist11 = pt_dict[tuple(pts[11])];
-        L=[[dist0,dist1,dist2,dist3,dist4,dist5,dist6,dist7,dist8,dist9,dist10,dist11]]
-        ctr = [np.array(L).astype(np.int32)]
-        img = cv2.drawContours(img, ctr, -1, (255,0,0), 4)
-
-
-
-        
-
-
-        
-        ##################################################################
-        return img
+         image. The geometry is scene.cylinder_model().
+"""
+def drawCylinder(img, ar_list, ar_id, camera_matrix, dist_coeff, segments=12):
+        rvec, tvec = marker_index(ar_list)[ar_id][2:4]
+        return draw_models(img, [(cylinder_model(segments=segments), rvec, tvec)], camera_matrix, dist_coeff)
 
 """
 MAIN CODE
 This main code reads images from the test cases folder and converts them into
 numpy array format using cv2.imread. Then it draws axis, cubes or cylinders on
-the ArUco markers detected in the images.
+the ArUco markers detected in the images, all markers in one batch.
 """
 
 
@@ -485,10 +646,7 @@ if __name__=="__main__":
         cam, dist = getCameraMatrix()
         img = cv2.imread("..\\TestCases\\image_1.jpg")
         aruco_list = detect_markers(img, cam, dist)
-        for i in aruco_list:
-                img = drawAxis(img, aruco_list, i[0], cam, dist)
-                img = drawCube(img, aruco_list, i[0], cam, dist)
-                img = drawCylinder(img, aruco_list, i[0], cam, dist)
+        img = draw_markers(img, aruco_list, [axis_model(), cube_model(), cylinder_model()], cam, dist)
         cv2.imshow("img", img)
         cv2.waitKey(0)
         cv2.destroyAllWindows()
@@ -0,0 +1,227 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: marker_dictionary.py
+*  Team: eYRC#TC#1155
+*
+*  The arena only uses a few marker ids, but detection matches every
+*  candidate against all 250 entries of DICT_5X5_250. This tool builds a
+*  dictionary with only the arena markers (the same printed patterns, so no
+*  reprinting is needed), or names the smallest predefined dictionary that
+*  covers them, and benchmarks identification time and false positives
+*  against DICT_5X5_250. --choose picks the ids with the largest distance
+*  between them, for when the arena markers are printed again.
+*
+*  python marker_dictionary.py --ids 0 1 2 --out arena_dictionary.npz
+*                              --camera Camera.npz --images "Task 1/Task 1.1/TestCases"
+*
+**************************************************************************
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from detect import MarkerDetector, save_dictionary
+from benchmark import load_images
+
+"""
+PREDEFINED
+Predefined dictionaries by marker size, smallest first. Dictionaries of the
+same marker size share their first entries, so a smaller one detects the same
+printed markers for the ids it covers.
+"""
+PREDEFINED = {
+        4: [(50, aruco.DICT_4X4_50), (100, aruco.DICT_4X4_100), (250, aruco.DICT_4X4_250), (1000, aruco.DICT_4X4_1000)],
+        5: [(50, aruco.DICT_5X5_50), (100, aruco.DICT_5X5_100), (250, aruco.DICT_5X5_250), (1000, aruco.DICT_5X5_1000)],
+        6: [(50, aruco.DICT_6X6_50), (100, aruco.DICT_6X6_100), (250, aruco.DICT_6X6_250), (1000, aruco.DICT_6X6_1000)],
+        7: [(50, aruco.DICT_7X7_50), (100, aruco.DICT_7X7_100), (250, aruco.DICT_7X7_250), (1000, aruco.DICT_7X7_1000)],
+}
+
+
+"""
+Function Name : marker_bits()
+Input: aruco_dict (aruco Dictionary)
+Output: bits (N,4,S*S) of every marker in its four rotations
+"""
+def marker_bits(aruco_dict):
+        size = aruco_dict.markerSize
+        bits = np.array([aruco.Dictionary_getBitsFromByteList(aruco_dict.bytesList[i:i+1], size)
+                         for i in range(len(aruco_dict.bytesList))], np.uint8)
+        return np.stack([np.rot90(bits, k, axes=(1,2)).reshape(len(bits), -1) for k in range(4)], axis=1)
+
+"""
+Function Name : distance_matrix()
+Input: rotated bits from marker_bits()
+Output: (N,N) matrix of the smallest Hamming distance between two markers over
+        all rotations. The diagonal holds the distance of each marker to its own
+        rotations, which also limits how many bit errors can be corrected.
+"""
+def distance_matrix(rotated):
+        upright = rotated[:,0,:].astype(np.int16)
+        dist = np.abs(upright[:,None,None,:] - rotated[None,:,:,:].astype(np.int16)).sum(axis=3)
+        self_dist = dist[np.arange(len(rotated)), np.arange(len(rotated)), 1:].min(axis=1)
+        dist = dist.min(axis=2)
+        dist[np.arange(len(rotated)), np.arange(len(rotated))] = self_dist
+        return dist
+
+"""
+Function Name : subset_dictionary()
+Input: base (aruco Dictionary), ids (entries of base to keep)
+Output: aruco Dictionary with only those markers, minimum distance
+Purpose: maxCorrectionBits is set from the distance between the kept markers, as
+         aruco does for its own dictionaries.
+"""
+def subset_dictionary(base, ids):
+        ids = np.asarray(ids, np.int32)
+        aruco_dict = aruco.Dictionary_create(1, base.markerSize)
+        aruco_dict.bytesList = base.bytesList[ids]
+        distance = int(distance_matrix(marker_bits(aruco_dict)).min())
+        aruco_dict.maxCorrectionBits = max((distance - 1)//2, 0)
+        return aruco_dict, distance
+
+"""
+Function Name : smallest_predefined()
+Input: ids, marker_size
+Output: name and id of the smallest predefined dictionary that has all the ids
+"""
+def smallest_predefined(ids, marker_size=5):
+        for count, dictionary in PREDEFINED[marker_size]:
+                if max(ids) < count:
+                        return 'DICT_%dX%d_%d' % (marker_size, marker_size, count), dictionary
+        raise ValueError('no predefined %dx%d dictionary has id %d' % (marker_size, marker_size, max(ids)))
+
+"""
+Function Name : choose_ids()
+Input: base (aruco Dictionary), count
+Output: ids of count markers of base with the largest smallest distance
+        between them (greedy)
+"""
+def choose_ids(base, count):
+        dist = distance_matrix(marker_bits(base))
+        ids = [int(np.argmax(np.diag(dist)))]
+        while len(ids) < count:
+                closest = np.minimum(dist[:, ids].min(axis=1), np.diag(dist))
+                closest[ids] = -1
+                ids.append(int(np.argmax(closest)))
+        return sorted(ids)
+
+"""
+Function Name : draw_pattern()
+Input: bits (S,S), cell size in pixels
+Output: gray marker image with the black border and a white margin
+"""
+def draw_pattern(bits, cell):
+        marker = np.zeros((len(bits) + 2,)*2, np.uint8)
+        marker[1:-1, 1:-1] = bits*255
+        marker = cv2.resize(marker, None, fx=cell, fy=cell, interpolation=cv2.INTER_NEAREST)
+        return cv2.copyMakeBorder(marker, cell, cell, cell, cell, cv2.BORDER_CONSTANT, value=255)
+
+"""
+Function Name : clutter_images()
+Input: base (aruco Dictionary), ids (arena ids, never drawn), count, seed
+Output: list of (name, gray) images full of markers that are not arena markers
+Purpose: Every image has a grid of other markers of the base dictionary and of
+         random bit patterns, slightly rotated, blurred and noisy. The arena
+         markers only need the arena ids, so every marker decoded in them is a
+         false positive, and an arena id the worst kind.
+"""
+def clutter_images(base, ids, count=20, seed=0):
+        rng = np.random.RandomState(seed)
+        others = np.setdiff1d(np.arange(len(base.bytesList)), ids)
+        size = base.markerSize
+        images = []
+        for n in range(count):
+                img = np.full((480, 640), 255, np.uint8)
+                for y in range(0, 480 - 119, 120):
+                        for x in range(0, 640 - 119, 128):
+                                if rng.rand() < 0.5:
+                                        bits = aruco.Dictionary_getBitsFromByteList(
+                                                base.bytesList[rng.choice(others)][None], size)
+                                else:
+                                        bits = rng.randint(0, 2, (size, size)).astype(np.uint8)
+                                marker = draw_pattern(bits, 100//(size + 4))
+                                h = marker.shape[0]
+                                turn = cv2.getRotationMatrix2D((h/2.0, h/2.0), rng.uniform(-20, 20), 1.0)
+                                marker = cv2.warpAffine(marker, turn, (h, h), borderValue=255)
+                                img[y + 10:y + 10 + h, x + 10:x + 10 + h] = marker
+                img = cv2.GaussianBlur(img, (3,3), rng.uniform(0.3, 1.0))
+                img = np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+                images.append(('clutter_%02d' % n, img))
+        return images
+
+"""
+Function Name : score()
+Input: detector, images (list of (name, gray)), ids, repeat
+Output: time per image in ms, number of arena ids found, number of other
+        ids found
+"""
+def score(detector, images, ids, repeat):
+        found = others = 0
+        for _, gray in images:
+                arena = np.isin(detector.find_corners(gray)[1], ids)
+                found += int(arena.sum())
+                others += int((~arena).sum())
+        start = time.perf_counter()
+        for _ in range(repeat):
+                for _, gray in images:
+                        detector.find_corners(gray)
+        return (time.perf_counter() - start)*1000.0/(repeat*max(len(images), 1)), found, others
+
+"""
+Function Name : benchmark()
+Input: dictionaries (list of (name, dictionary for MarkerDetector)), camera
+       matrix and dist_coeff, images with real markers, clutter images, ids, repeat
+Output: None
+Purpose: Prints the detection time, arena and other markers found on the real
+         images, and the markers decoded on the clutter images (the false
+         positives), split into arena ids and other ids, for each dictionary.
+"""
+def benchmark(dictionaries, camera_matrix, dist_coeff, images, clutter, ids, repeat=5):
+        for name, dictionary in dictionaries:
+                detector = MarkerDetector(camera_matrix, dist_coeff, dictionary=dictionary)
+                ms, found, others = score(detector, images, ids, repeat)
+                clutter_ms, false_arena, false_others = score(detector, clutter, ids, repeat)
+                print('%-20s %7.2f ms  found %3d (+%d other)   clutter %7.2f ms  false positives %3d arena '
+                      '+ %3d other / %d images' % (name, ms, found, others, clutter_ms, false_arena, false_others,
+                                                   len(clutter)))
+
+"""
+Function Name : main()
+Purpose: Parses the command line, saves the arena dictionary and runs the benchmark.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Build a dictionary with only the arena markers.')
+        parser.add_argument('--ids', type=int, nargs='*', default=[0, 1, 2], help='arena marker ids')
+        parser.add_argument('--choose', type=int, default=0,
+                            help='pick this many ids far apart from each other instead of --ids')
+        parser.add_argument('--out', default='arena_dictionary.npz')
+        parser.add_argument('--camera', default='Camera.npz', help='calibration file')
+        parser.add_argument('--images', default=os.path.join('Task 1', 'Task 1.1', 'TestCases'))
+        parser.add_argument('--clutter', type=int, default=20, help='number of clutter images')
+        parser.add_argument('--repeat', type=int, default=5)
+        args = parser.parse_args()
+
+        base = aruco.Dictionary_get(aruco.DICT_5X5_250)
+        ids = choose_ids(base, args.choose) if args.choose else sorted(set(args.ids))
+        aruco_dict, distance = subset_dictionary(base, ids)
+        save_dictionary(args.out, aruco_dict, ids)
+        name, predefined = smallest_predefined(ids)
+        print('ids %s: distance %d, corrects %d bits, saved %s; smallest predefined dictionary %s' %
+              (ids, distance, aruco_dict.maxCorrectionBits, args.out, name))
+
+        if not os.path.exists(args.camera):
+                return
+        with np.load(args.camera) as X:
+                camera_matrix, dist_coeff = X['mtx'], X['dist']
+        benchmark([('DICT_5X5_250', aruco.DICT_5X5_250), (name, predefined), (args.out, args.out)],
+                  camera_matrix, dist_coeff, load_images(args.images), clutter_images(base, ids, args.clutter),
+                  ids, args.repeat)
+
+
+if __name__ == "__main__":
+        main()
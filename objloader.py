@@ -1,7 +1,22 @@
+import ctypes
+import hashlib
+import json
+import os
+import numpy as np
 import pygame
 from OpenGL.GL import *
 
-def MTL(filename):
+# floats per vertex in the interleaved arrays: position 3, normal 3, texcoord 2
+VERTEX_SIZE = 8
+# written at the start of a mesh cache file, change the number when the
+# cached arrays change
+MESH_CACHE_MAGIC = b'OBJMESH1'
+# arrays of a mesh kept in its cache file
+MESH_ARRAYS = ['vertices', 'normals', 'texcoords', 'corners', 'sizes', 'materials', 'interleaved', 'indices']
+
+def read_mtl(filename, decode=True):
+    """Reads a .mtl file without OpenGL. With decode the map_Kd texture of
+    a material is loaded into 'image_Kd' by decode_texture(). """
     contents = {}
     mtl = None
     for line in open(filename, "r"):
@@ -15,67 +30,424 @@ def MTL(filename):
         elif values[0] == 'map_Kd':
             # load the texture referred to by this declaration
             mtl[values[0]] = list(map(str, values[1:]))
-            surf = pygame.image.load(values[1])
-            image = pygame.image.tostring(surf, 'RGBA', 1)
-            ix, iy = surf.get_rect().size
-            texid = mtl['texture_Kd'] = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, texid)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER,
-                GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER,
-                GL_LINEAR)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA,
-                GL_UNSIGNED_BYTE, image)
+            if decode:
+                mtl['image_Kd'] = decode_texture(values[1])
         else:
             mtl[values[0]] = list(map(float, values[1:]))
     return contents
 
+def decode_texture(filename):
+    """Loads an image file as (RGBA bytes, width, height), bottom row
+    first as glTexImage2D wants it. """
+    surf = pygame.image.load(filename)
+    image = pygame.image.tostring(surf, 'RGBA', 1)
+    ix, iy = surf.get_rect().size
+    return image, ix, iy
+
+def upload_texture(image, ix, iy):
+    """Creates a GL texture from decode_texture() data. """
+    texid = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texid)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER,
+        GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER,
+        GL_LINEAR)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA,
+        GL_UNSIGNED_BYTE, image)
+    return texid
+
+def upload_materials(contents, textures=None):
+    """Uploads the decoded textures of read_mtl() materials as their
+    'texture_Kd'. textures maps image files to the textures already
+    uploaded, so models using the same image share one texture. """
+    if textures is None:
+        textures = {}
+    for mtl in contents.values():
+        if 'image_Kd' in mtl:
+            image = mtl.pop('image_Kd')
+            if mtl['map_Kd'][0] not in textures:
+                textures[mtl['map_Kd'][0]] = upload_texture(*image)
+            mtl['texture_Kd'] = textures[mtl['map_Kd'][0]]
+    return contents
+
+def MTL(filename):
+    return upload_materials(read_mtl(filename))
+
+def read_obj_lines(filename, swapyz=False):
+    """Reads a Wavefront OBJ file line by line in python. Returns the
+    vertices, normals, texcoords, faces (vertex, normal and texcoord
+    indices and the material of each face) and the mtllib file. Kept to
+    check and time parse_obj() against. """
+    vertices = []
+    normals = []
+    texcoords = []
+    faces = []
+    mtllib = None
+
+    material = None
+    for line in open(filename, "r"):
+        if line.startswith('#'): continue
+        values = line.split()
+        if not values: continue
+        if values[0] == 'v':
+            v = list(map(float, values[1:4]))
+            if swapyz:
+                v = v[0], v[2], v[1]
+            vertices.append(v)
+        elif values[0] == 'vn':
+            v = list(map(float, values[1:4]))
+            if swapyz:
+                v = v[0], v[2], v[1]
+            normals.append(v)
+        elif values[0] == 'vt':
+            texcoords.append(list(map(float, values[1:3])))
+        elif values[0] in ('usemtl', 'usemat'):
+            material = values[1]
+        elif values[0] == 'mtllib':
+            mtllib = values[1]
+        elif values[0] == 'f':
+            face = []
+            coords = []
+            norms = []
+            for v in values[1:]:
+                w = v.split('/')
+                face.append(int(w[0]))
+                if len(w) >= 2 and len(w[1]) > 0:
+                    coords.append(int(w[1]))
+                else:
+                    coords.append(0)
+                if len(w) >= 3 and len(w[2]) > 0:
+                    norms.append(int(w[2]))
+                else:
+                    norms.append(0)
+            faces.append((face, norms, coords, material))
+    return vertices, normals, texcoords, faces, mtllib
+
+def _lines(buf, line, selected):
+    """Bytes of the selected lines of the file, one line after another. """
+    return buf[selected[line]].tobytes()
+
+def _floats(text, rows, width):
+    """Converts rows of numbers to a (rows, width) float32 array with one
+    numpy call, falling back to a row at a time when a row does not hold
+    exactly width numbers. """
+    values = np.fromstring(text, np.float32, sep=' ')
+    if values.size == rows * width:
+        return values.reshape(-1, width)
+    values = [(list(map(float, row.split()[:width])) + [0.0] * width)[:width]
+              for row in text.splitlines() if row.strip()]
+    return np.array(values, np.float32).reshape(-1, width)
+
+def _corners(text, sizes, slashes):
+    """Parses the face lines into the (C, 3) vertex, texcoord and normal
+    index of every corner (0 when missing). sizes and slashes are the
+    number of corners and of '/' of every face. Handles the v, v/t, v//n
+    and v/t/n forms. """
+    corners = np.zeros((sizes.sum(), 3), np.int64)
+    text = text.replace(b'//', b'/0/')
+    fields = slashes[0] // max(sizes[0], 1) + 1 if len(sizes) else 1
+    if (slashes == (fields - 1) * sizes).all():
+        values = np.fromstring(text.replace(b'/', b' '), np.int64, sep=' ')
+        corners[:, :fields] = values.reshape(-1, fields)
+    else:
+        # faces with different forms
+        for i, token in enumerate(text.split()):
+            w = token.split(b'/')
+            corners[i, :len(w)] = [int(x) for x in w]
+    return corners
+
+def parse_obj(filename, swapyz=False):
+    """Reads a Wavefront OBJ file with numpy instead of a python loop over
+    the lines: the lines are sorted by their first bytes and every kind of
+    line is converted with one numpy call. Returns a dict of the vertices,
+    normals and texcoords arrays, the 1-based corners (C, 3) and sizes of
+    the faces, the material number of each face, the material_names and
+    the mtllib file. Negative indices are resolved. """
+    with open(filename, "rb") as f:
+        data = f.read()
+    if b'\n ' in data or b'\n\t' in data or data[:1] in (b' ', b'\t'):
+        data = b'\n'.join(row.lstrip() for row in data.split(b'\n'))
+    buf = np.frombuffer(data + b'\n', np.uint8).copy()
+    buf[buf == ord('\t')] = ord(' ')
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    line = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    head = [buf[np.minimum(starts + i, len(buf) - 1)] for i in range(3)]
+    space = ord(' ')
+    is_v = (head[0] == ord('v')) & (head[1] == space)
+    is_vt = (head[0] == ord('v')) & (head[1] == ord('t')) & (head[2] == space)
+    is_vn = (head[0] == ord('v')) & (head[1] == ord('n')) & (head[2] == space)
+    is_f = (head[0] == ord('f')) & (head[1] == space)
+    # blank the keywords, only numbers are left on these lines
+    for kind, length in [(is_v, 1), (is_vt, 2), (is_vn, 2), (is_f, 1)]:
+        for i in range(length):
+            buf[starts[kind] + i] = space
+
+    vertices = _floats(_lines(buf, line, is_v), is_v.sum(), 3)
+    normals = _floats(_lines(buf, line, is_vn), is_vn.sum(), 3)
+    texcoords = _floats(_lines(buf, line, is_vt), is_vt.sum(), 2)
+    if swapyz:
+        vertices = vertices[:, [0, 2, 1]]
+        normals = normals[:, [0, 2, 1]]
+
+    # corners are the tokens of a face line, counted where a token starts
+    blank = (buf == space) | (buf == ord('\n')) | (buf == ord('\r'))
+    token = ~blank & np.concatenate([[True], blank[:-1]])
+    face_lines = np.flatnonzero(is_f)
+    sizes = np.bincount(line[token], minlength=len(ends))[face_lines]
+    slashes = np.bincount(line[buf == ord('/')], minlength=len(ends))[face_lines]
+    corners = _corners(_lines(buf, line, is_f), sizes, slashes)
+
+    # every face uses the material of the last usemtl line before it, the
+    # few usemtl and mtllib lines are read in python
+    usemtl = []
+    mtllib = None
+    for i in np.flatnonzero((head[0] == ord('u')) | (head[0] == ord('m'))):
+        values = data[starts[i]:ends[i]].decode().split()
+        if len(values) > 1 and values[0] in ('usemtl', 'usemat'):
+            usemtl.append((i, values[1]))
+        elif len(values) > 1 and values[0] == 'mtllib':
+            mtllib = values[1]
+    names = [None] + [name for _, name in usemtl]
+    which = np.searchsorted([i for i, _ in usemtl], face_lines)
+    material_names = []
+    for name in [names[i] for i in np.unique(which)]:
+        if name not in material_names:
+            material_names.append(name)
+    numbers = np.array([material_names.index(name) if name in material_names else -1 for name in names], np.int64)
+    materials = numbers[which]
+
+    if (corners < 0).any():
+        # negative indices count back from the last v, vt or vn line
+        # before the face
+        before = np.cumsum(np.stack([is_v, is_vt, is_vn], axis=1), axis=0)[face_lines]
+        before = np.repeat(before, sizes, axis=0)
+        corners = np.where(corners < 0, before + corners + 1, corners)
+
+    return {'vertices': vertices, 'normals': normals, 'texcoords': texcoords,
+            'corners': corners, 'sizes': sizes, 'materials': materials,
+            'material_names': material_names, 'mtllib': mtllib}
+
+def mesh_faces(corners, sizes, materials, material_names):
+    """Faces of a parse_obj() mesh as the (vertices, normals, texcoords,
+    material) lists of index that read_obj_lines() returns. """
+    v, t, n = [column.tolist() for column in np.asarray(corners).T]
+    ends = np.cumsum(sizes).tolist()
+    faces = []
+    start = 0
+    for end, material in zip(ends, np.asarray(materials).tolist()):
+        faces.append((v[start:end], n[start:end], t[start:end], material_names[material]))
+        start = end
+    return faces
+
+def triangulate(sizes):
+    """Splits faces with the given numbers of corners into triangle fans.
+    The corners of all faces are listed one after another, returns the
+    (T, 3) corner indices of the triangles. """
+    sizes = np.asarray(sizes, np.int64)
+    count = np.maximum(sizes - 2, 0)
+    first = np.repeat(np.cumsum(sizes) - sizes, count)
+    step = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count) + 1
+    return np.stack([first, first + step, first + step + 1], axis=1)
+
+def mesh_arrays(vertices, normals, texcoords, corners, sizes, materials):
+    """Builds the indexed triangle mesh of the faces.
+    corners (C, 3) holds the 1-based vertex, texcoord and normal index of
+    every face corner (0 when missing), sizes the corners of each face and
+    materials the material number of each face. Returns the interleaved
+    (U, VERTEX_SIZE) float32 vertices, one per distinct corner, the uint32
+    triangle indices sorted by material and the (material, first index,
+    index count) of each material group. """
+    vertices = np.asarray(vertices, np.float32).reshape(-1, 3)
+    normals = np.asarray(normals, np.float32).reshape(-1, 3)
+    texcoords = np.asarray(texcoords, np.float32).reshape(-1, 2)
+    corners = np.asarray(corners, np.int64).reshape(-1, 3)
+    sizes = np.asarray(sizes, np.int64)
+    triangles = triangulate(sizes)
+    triangle_materials = np.repeat(np.asarray(materials, np.int64), np.maximum(sizes - 2, 0))
+
+    # one vertex per distinct (vertex, texcoord, normal) corner
+    key = (corners[:, 0] * (len(texcoords) + 1) + corners[:, 1]) * (len(normals) + 1) + corners[:, 2]
+    unique, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    v, t, n = corners[first].T
+    interleaved = np.zeros((len(unique), VERTEX_SIZE), np.float32)
+    interleaved[:, 0:3] = vertices[v - 1]
+    interleaved[n > 0, 3:6] = normals[n[n > 0] - 1]
+    interleaved[t > 0, 6:8] = texcoords[t[t > 0] - 1]
+
+    order = np.argsort(triangle_materials, kind='stable')
+    indices = inverse.ravel()[triangles[order]].astype(np.uint32).ravel()
+    groups = []
+    numbers, starts, counts = np.unique(triangle_materials[order], return_index=True, return_counts=True)
+    for number, start, count in zip(numbers, starts, counts):
+        groups.append((int(number), int(start) * 3, int(count) * 3))
+    return interleaved, indices, groups
+
+def build_mesh(filename, swapyz=False):
+    """Parses and triangulates a Wavefront OBJ file. Returns the parse_obj()
+    dict with the interleaved and indices arrays, the (material number,
+    first index, index count) groups and has_normals, has_texcoords. """
+    mesh = parse_obj(filename, swapyz)
+    corners = mesh['corners'].astype(np.int32)
+    mesh['corners'] = corners
+    mesh['sizes'] = mesh['sizes'].astype(np.int32)
+    mesh['materials'] = mesh['materials'].astype(np.int32)
+    mesh['interleaved'], mesh['indices'], mesh['groups'] = mesh_arrays(
+        mesh['vertices'], mesh['normals'], mesh['texcoords'], corners, mesh['sizes'], mesh['materials'])
+    mesh['has_normals'] = bool((corners[:, 2] > 0).any())
+    mesh['has_texcoords'] = bool((corners[:, 1] > 0).any())
+    return mesh
+
+def mesh_cache_path(filename):
+    """The cache file of an OBJ file, next to it. """
+    return os.path.splitext(filename)[0] + '.mesh'
+
+def file_sha1(filename):
+    """sha1 hex digest of the content of a file. """
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def save_mesh(filename, swapyz, mesh):
+    """Writes a build_mesh() mesh to the cache file of filename: the magic,
+    the length of a json header, the header (key of the OBJ file, material
+    table and where every array starts) and the raw arrays, each aligned
+    to 64 bytes. Returns False when the file could not be written. """
+    stat = os.stat(filename)
+    header = {'swapyz': bool(swapyz), 'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+              'sha1': file_sha1(filename), 'mtllib': mesh['mtllib'],
+              'material_names': mesh['material_names'], 'groups': mesh['groups'],
+              'has_normals': mesh['has_normals'], 'has_texcoords': mesh['has_texcoords'], 'arrays': {}}
+    offset = 0
+    for name in MESH_ARRAYS:
+        array = np.ascontiguousarray(mesh[name])
+        header['arrays'][name] = [array.dtype.str, list(array.shape), offset]
+        offset += -(-array.nbytes // 64) * 64
+    text = json.dumps(header).encode()
+    # the arrays start at a multiple of 64 after the header
+    text += b' ' * (-(len(MESH_CACHE_MAGIC) + 8 + len(text)) % 64)
+    start = len(MESH_CACHE_MAGIC) + 8 + len(text)
+    path = mesh_cache_path(filename)
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(MESH_CACHE_MAGIC)
+            f.write(np.array([len(text)], '<u8').tobytes())
+            f.write(text)
+            for name in MESH_ARRAYS:
+                dtype, shape, at = header['arrays'][name]
+                f.seek(start + at)
+                f.write(np.ascontiguousarray(mesh[name]).tobytes())
+            f.truncate(start + offset)
+        os.replace(temporary, path)
+    except (IOError, OSError):
+        return False
+    return True
+
+def rewrite_mesh_header(path, header, length):
+    """Writes header over the header of the cache file at path, in place,
+    padded to the length of the old one. Returns False when it does not
+    fit or the file could not be written. """
+    text = json.dumps(header).encode()
+    if len(text) > length:
+        return False
+    try:
+        with open(path, 'r+b') as f:
+            f.seek(len(MESH_CACHE_MAGIC) + 8)
+            f.write(text + b' ' * (length - len(text)))
+    except (IOError, OSError):
+        return False
+    return True
+
+def load_mesh(filename, swapyz=False):
+    """Reads the cache file of filename written by save_mesh(), with the
+    arrays memory mapped. Returns None when there is no cache or it was
+    made from another version of the OBJ file: the size must be the same,
+    and the content hash too when the mtime changed. When only the mtime
+    changed, the header is rewritten with the new one so the next load
+    does not hash the file again. """
+    path = mesh_cache_path(filename)
+    try:
+        stat = os.stat(filename)
+        with open(path, 'rb') as f:
+            if f.read(len(MESH_CACHE_MAGIC)) != MESH_CACHE_MAGIC:
+                return None
+            length = int(np.frombuffer(f.read(8), '<u8')[0])
+            header = json.loads(f.read(length).decode())
+        if header['swapyz'] != bool(swapyz) or header['size'] != stat.st_size:
+            return None
+        touched = header['mtime'] != stat.st_mtime_ns
+        if touched and header['sha1'] != file_sha1(filename):
+            return None
+        if touched:
+            header['size'], header['mtime'] = stat.st_size, stat.st_mtime_ns
+            touched = not rewrite_mesh_header(path, header, length)
+        raw = np.memmap(path, np.uint8, 'r')
+    except (IOError, OSError, ValueError, KeyError, IndexError):
+        return None
+    start = len(MESH_CACHE_MAGIC) + 8 + length
+    mesh = {}
+    for name in MESH_ARRAYS:
+        dtype, shape, at = header['arrays'][name]
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        mesh[name] = raw[start + at:start + at + count * dtype.itemsize].view(dtype).reshape(shape)
+    for key in ['mtllib', 'material_names', 'has_normals', 'has_texcoords']:
+        mesh[key] = header[key]
+    mesh['groups'] = [tuple(group) for group in header['groups']]
+    if touched:
+        # the new header did not fit in the old one, write the whole file again
+        save_mesh(filename, swapyz, mesh)
+    return mesh
+
 class OBJ:
-    def __init__(self, filename, swapyz=False):
-        """Loads a Wavefront OBJ file. """
-        self.vertices = []
-        self.normals = []
-        self.texcoords = []
-        self.faces = []
-
-        material = None
-        for line in open(filename, "r"):
-            if line.startswith('#'): continue
-            values = line.split()
-            if not values: continue
-            if values[0] == 'v':
-                v = list(map(float, values[1:4]))
-                if swapyz:
-                    v = v[0], v[2], v[1]
-                self.vertices.append(v)
-            elif values[0] == 'vn':
-                v = list(map(float, values[1:4]))
-                if swapyz:
-                    v = v[0], v[2], v[1]
-                self.normals.append(v)
-            elif values[0] == 'vt':
-                self.texcoords.append(list(map(float, values[1:3])))
-            elif values[0] in ('usemtl', 'usemat'):
-                material = values[1]
-            elif values[0] == 'mtllib':
-                self.mtl = MTL(values[1])
-            elif values[0] == 'f':
-                face = []
-                texcoords = []
-                norms = []
-                for v in values[1:]:
-                    w = v.split('/')
-                    face.append(int(w[0]))
-                    if len(w) >= 2 and len(w[1]) > 0:
-                        texcoords.append(int(w[1]))
-                    else:
-                        texcoords.append(0)
-                    if len(w) >= 3 and len(w[2]) > 0:
-                        norms.append(int(w[2]))
-                    else:
-                        norms.append(0)
-                self.faces.append((face, norms, texcoords, material))
+    def __init__(self, filename, swapyz=False, vbo=False, cache=True, mesh=None, mtl=None):
+        """Loads a Wavefront OBJ file. With vbo the faces are drawn from
+        vertex buffer objects by render(), else from the display list
+        gl_list. With cache the parsed mesh is read from the cache file
+        next to the OBJ file, and written there when it is missing or out
+        of date. A build_mesh() mesh and MTL() materials already loaded
+        elsewhere can be passed in, then only the GL objects are made. """
+        if mesh is None and cache:
+            mesh = load_mesh(filename, swapyz)
+        if mesh is None:
+            mesh = build_mesh(filename, swapyz)
+            if cache:
+                save_mesh(filename, swapyz, mesh)
+        self.vertices = mesh['vertices']
+        self.normals = mesh['normals']
+        self.texcoords = mesh['texcoords']
+        self.corners = mesh['corners']
+        self.sizes = mesh['sizes']
+        self.materials = mesh['materials']
+        self.material_names = mesh['material_names']
+        self.interleaved = mesh['interleaved']
+        self.indices = mesh['indices']
+        self.groups = [(self.material_names[i], start, count) for i, start, count in mesh['groups']]
+        self.has_normals = mesh['has_normals']
+        self.has_texcoords = mesh['has_texcoords']
+        self._faces = None
+        if mtl is not None:
+            self.mtl = mtl
+        elif mesh['mtllib'] is not None:
+            self.mtl = MTL(mesh['mtllib'])
+
+        self.vbo = self.ebo = None
+        self.gl_list = None
+        if vbo:
+            self.upload()
+        else:
+            self.compile_list()
 
+    @property
+    def faces(self):
+        """(vertices, normals, texcoords, material) of every face, built
+        on first use. """
+        if self._faces is None:
+            self._faces = mesh_faces(self.corners, self.sizes, self.materials, self.material_names)
+        return self._faces
+
+    def compile_list(self):
+        """Compiles the faces into the display list gl_list. """
         self.gl_list = glGenLists(1)
         glNewList(self.gl_list, GL_COMPILE)
         # glEnable(GL_TEXTURE_2D)
@@ -102,3 +474,56 @@ class OBJ:
             glEnd()
         # glDisable(GL_TEXTURE_2D)
         glEndList()
+
+    def upload(self):
+        """Copies the vertex and index arrays into buffer objects, once. """
+        self.vbo, self.ebo = glGenBuffers(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.interleaved.nbytes, self.interleaved, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def free(self):
+        """Deletes the buffer objects or the display list of the model.
+        Textures are left to their owner, they may be shared. """
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ebo])
+            self.vbo = self.ebo = None
+        if self.gl_list is not None:
+            glDeleteLists(self.gl_list, 1)
+            self.gl_list = None
+
+    def render(self):
+        """Draws the model, one glDrawElements call per material when it
+        was uploaded to buffer objects, else by calling gl_list. """
+        if self.vbo is None:
+            glCallList(self.gl_list)
+            return
+        stride = VERTEX_SIZE * 4
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, stride, ctypes.c_void_p(0))
+        if self.has_normals:
+            glEnableClientState(GL_NORMAL_ARRAY)
+            glNormalPointer(GL_FLOAT, stride, ctypes.c_void_p(12))
+        if self.has_texcoords:
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glTexCoordPointer(2, GL_FLOAT, stride, ctypes.c_void_p(24))
+        glFrontFace(GL_CCW)
+        for material, start, count in self.groups:
+            mtl = self.mtl[material]
+            if 'texture_Kd' in mtl:
+                # use diffuse texmap
+                glBindTexture(GL_TEXTURE_2D, mtl['texture_Kd'])
+            else:
+                # just use diffuse colour
+                glColor(*mtl['Kd'])
+            glDrawElements(GL_TRIANGLES, count, GL_UNSIGNED_INT, ctypes.c_void_p(start * 4))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
@@ -0,0 +1,90 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: objloader_benchmark.py
+*  Team: eYRC#TC#1155
+*
+*  Times the numpy OBJ parser (objloader.parse_obj) against the line by
+*  line parser (objloader.read_obj_lines) on the models of the app, and
+*  checks that both read the same vertices, normals, texcoords and faces.
+*  Only the text parsing is timed, no OpenGL context is needed.
+*
+*  python objloader_benchmark.py --repeat 5
+*
+**************************************************************************
+"""
+
+import argparse
+import time
+import numpy as np
+from objloader import read_obj_lines, parse_obj, mesh_faces
+
+"""
+MODELS
+The models init_gl() of opengl_final.py loads.
+"""
+MODELS = ['waterpitcher(low).obj', 'Crow.obj', 'waterpitcher(medium).obj', 'waterpitcher(high).obj',
+          'pileofstone(high).obj', 'pileofstone(dim).obj']
+
+
+"""
+Function Name : best_time()
+Input: function, filename, repeat
+Output: shortest time of repeat calls in ms, result of the last call
+"""
+def best_time(function, filename, repeat):
+        best = None
+        for _ in range(repeat):
+                start = time.perf_counter()
+                result = function(filename, swapyz=True)
+                ms = (time.perf_counter() - start)*1000
+                best = ms if best is None else min(best, ms)
+        return best, result
+
+"""
+Function Name : same_model()
+Input: result of read_obj_lines(), result of parse_obj()
+Output: True if both hold the same model. Negative face indices are only
+        resolved by parse_obj(), so faces using them are not compared.
+"""
+def same_model(lines, mesh):
+        vertices, normals, texcoords, faces, mtllib = lines
+        if mtllib != mesh['mtllib']:
+                return False
+        for old, new, width in [(vertices, mesh['vertices'], 3), (normals, mesh['normals'], 3),
+                                (texcoords, mesh['texcoords'], 2)]:
+                if not np.allclose(np.array(old, np.float32).reshape(-1,width), new):
+                        return False
+        new_faces = mesh_faces(mesh['corners'], mesh['sizes'], mesh['materials'], mesh['material_names'])
+        if len(faces) != len(new_faces):
+                return False
+        return all(old == new for old, new in zip(faces, new_faces)
+                   if min(min(index) for index in old[:3] if index) >= 0)
+
+"""
+Function Name : main()
+Purpose: Times both parsers on every model and prints the speed up.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Benchmark the OBJ parsers.')
+        parser.add_argument('models', nargs='*', default=MODELS)
+        parser.add_argument('--repeat', type=int, default=5)
+        args = parser.parse_args()
+
+        total_lines = total_numpy = 0
+        print('%-26s %8s %10s %10s %8s  %s' % ('model', 'faces', 'lines ms', 'numpy ms', 'speedup', 'same'))
+        for model in args.models:
+                lines_ms, lines = best_time(read_obj_lines, model, args.repeat)
+                numpy_ms, mesh = best_time(parse_obj, model, args.repeat)
+                total_lines += lines_ms
+                total_numpy += numpy_ms
+                print('%-26s %8d %10.1f %10.1f %7.1fx  %s' % (model, len(mesh['sizes']), lines_ms, numpy_ms,
+                                                              lines_ms/max(numpy_ms, 1e-9), same_model(lines, mesh)))
+        print('%-26s %8s %10.1f %10.1f %7.1fx' % ('total', '', total_lines, total_numpy,
+                                                  total_lines/max(total_numpy, 1e-9)))
+
+
+if __name__ == "__main__":
+        main()
@@ -39,20 +39,53 @@ from OpenGL.GLUT import *
 from PIL import Image
 import pygame
 import time 
+import os
 from objloader import *
+from detect import MarkerDetector, marker_index
+from capture import FrameGrabber
+from pipeline import DetectionPipeline
+from calibration import Calibration
+from arena import ArenaDetector
+from tracking import GatedDetector, FilteredDetector
+from assets import AssetManager
 
 
 texture_object = None
 texture_background = None
 camera_matrix = None
 dist_coeff = None
-cap = cv2.VideoCapture(1)
-waterpitcher_low = None
-waterpitcher_med = None
-waterpitcher_hig = None
-pileofstone_hig = None
-pileofstone_low = None
-crow = None
+calibration = None
+detector = None
+cap = None
+pipeline = None
+last_frame = None
+last_markers = []
+# detect markers on a worker thread while the GL thread draws
+PIPELINED = True
+# undistort the background so it matches the pinhole projection of OpenGL
+UNDISTORT_BACKGROUND = False
+# written by arena.py, when present only the robot marker is detected live
+ARENA_MAP = 'arena_map.npz'
+# reuse the last markers while the camera picture does not change
+GATE_UNCHANGED = True
+# smooth the marker poses with a PoseFilter, so the models do not jitter
+FILTER_POSES = False
+# with FILTER_POSES, detect on every k-th frame and predict the poses between
+FILTER_DETECT_EVERY = 1
+# DetectorParameters profile of tune_detector.py to apply, e.g.
+# detect.PROFILE_FILE, the aruco defaults if None
+DETECTOR_PROFILE = None
+# draw the models from vertex buffer objects instead of display lists
+USE_VBO = True
+# name of each model and its OBJ file, loaded in the background on first use
+MODEL_FILES = [('waterpitcher_low', 'waterpitcher(low).obj'), ('crow', 'crow.obj'),
+               ('waterpitcher_med', 'waterpitcher(medium).obj'), ('waterpitcher_hig', 'waterpitcher(high).obj'),
+               ('pileofstone_hig', 'pileofstone(high).obj'), ('pileofstone_low', 'pileofstone(dim).obj')]
+# models drawn from the first frame, loaded while the window opens
+PRELOAD = ['pileofstone_hig', 'waterpitcher_low', 'waterpitcher_med']
+# most bytes of models and textures kept loaded, least recently drawn go first
+ASSET_BUDGET = 32 << 20
+assets = None
 INVERSE_MATRIX = np.array([[ 1.0, 1.0, 1.0, 1.0],
                            [-1.0,-1.0,-1.0,-1.0],
                            [-1.0,-1.0,-1.0,-1.0],
@@ -64,12 +97,23 @@ Function Name : getCameraMatrix()
 Input: None
 Output: camera_matrix, dist_coeff
 Purpose: Loads the camera calibration file provided and returns the camera and
-         distortion matrix saved in the calibration file.
+         distortion matrix saved in the calibration file. Also builds the marker
+         detector, from the arena map if one was surveyed, behind a
+         GatedDetector that skips detection on unchanged frames and a
+         FilteredDetector that smooths the poses, as the settings ask.
 """
 def getCameraMatrix():
-        global camera_matrix, dist_coeff
-        with np.load('Camera.npz') as X:
-                camera_matrix, dist_coeff, _, _ = [X[i] for i in ('mtx','dist','rvecs','tvecs')]
+        global camera_matrix, dist_coeff, calibration, detector
+        calibration = Calibration('Camera.npz')
+        camera_matrix, dist_coeff = calibration.camera_matrix, calibration.dist_coeff
+        if os.path.exists(ARENA_MAP):
+                detector = ArenaDetector(ARENA_MAP, camera_matrix, dist_coeff, profile=DETECTOR_PROFILE)
+        else:
+                detector = MarkerDetector(camera_matrix, dist_coeff, profile=DETECTOR_PROFILE)
+        if GATE_UNCHANGED:
+                detector = GatedDetector(detector)
+        if FILTER_POSES:
+                detector = FilteredDetector(detector, detect_every=FILTER_DETECT_EVERY)
 
 
 
@@ -81,11 +125,23 @@ Function Name : main()
 Input: None
 Output: None
 Purpose: Initialises OpenGL window and callback functions. Then starts the event
-         processing loop.
+         processing loop. The PRELOAD models start loading in the background
+         first, while the window opens and the camera warms up.
 """
 def main():
+        global pipeline, cap, assets
+        assets = AssetManager(vbo=USE_VBO, budget=ASSET_BUDGET)
+        for name, filename in MODEL_FILES:
+                assets.register(name, filename, swapyz = True)
+        for name in PRELOAD:
+                assets.load(name)
+        cap = FrameGrabber(1)
         glutInit()
         getCameraMatrix()
+        if PIPELINED:
+                pipeline = DetectionPipeline(cap, detector).start()
+        else:
+                cap.start()
         glutInitWindowSize(640, 480)
         glutInitWindowPosition(625, 100)
         glutInitDisplayMode(GLUT_RGB | GLUT_DEPTH | GLUT_DOUBLE)
@@ -104,12 +160,6 @@ Purpose: Initialises various parameters related to OpenGL scene.
 """
 def init_gl():
         global texture_object, texture_background
-        global waterpitcher_low
-        global crow
-        global waterpitcher_med
-        global waterpitcher_hig
-        global pileofstone_hig
-        global pileofstone_low
         glClearColor(0.0, 0.0, 0.0, 0.0)
         glClearDepth(1.0)
         glDepthFunc(GL_LESS)
@@ -121,12 +171,16 @@ def init_gl():
         glEnable(GL_LIGHT0)
         texture_background = glGenTextures(1)
         texture_object = glGenTextures(1)
-        waterpitcher_low = OBJ('waterpitcher(low).obj', swapyz = True)
-        crow=OBJ('crow.obj', swapyz = True)
-        waterpitcher_med = OBJ('waterpitcher(medium).obj', swapyz = True)
-        waterpitcher_hig = OBJ('waterpitcher(high).obj', swapyz = True)
-        pileofstone_hig = OBJ('pileofstone(high).obj', swapyz = True)
-        pileofstone_low = OBJ('pileofstone(dim).obj', swapyz = True)
+
+"""
+Function Name : update_models()
+Input: None
+Output: None
+Purpose: Uploads a model the AssetManager finished loading, at most one per
+         frame. Until then assets.get() of the model returns None.
+"""
+def update_models():
+        assets.poll(limit=1)
 """
 Function Name : resize()
 Input: None
@@ -144,30 +198,44 @@ Function Name : drawGLScene()
 Input: None
 Output: None
 Purpose: It is the main callback function which is called again and
-         again by the event processing loop. In this loop, the webcam frame
-         is received and set as background for OpenGL scene. ArUco marker is
-         detected in the webcam frame and 3D model is overlayed on the marker
-         by calling the overlay() function.
+         again by the event processing loop. In this loop, the newest webcam
+         frame is taken from the FrameGrabber thread and set as background for
+         OpenGL scene. ArUco marker is detected in the webcam frame and 3D
+         model is overlayed on the marker by calling the overlay() function.
+         With PIPELINED set, the frame and its markers come already detected
+         from the DetectionPipeline worker. If no new frame arrives in time,
+         the last frame is drawn again with its markers.
 """
 def drawGLScene():
+        global last_frame, last_markers
+        update_models()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         ar_list = []
-        ret, frame = cap.read()
-        if ret == True:
+        if PIPELINED:
+                frame, _, ar_list = pipeline.latest(timeout=0.5)
+        else:
+                ret, frame = cap.read(timeout=0.5)
+                if ret == True:
+                        ar_list = detect_markers(frame)
+        if frame is None:
+                # no new frame in time: draw the last one and its markers again
+                frame, ar_list = last_frame, last_markers
+        else:
+                last_frame, last_markers = frame, ar_list
+        if frame is not None:
                 draw_background(frame)
                 glMatrixMode(GL_MODELVIEW)
                 glLoadIdentity()
-                ar_list = detect_markers(frame)
                 for i in ar_list:
                           if i[0] == 0:
-                                  overlay(frame, ar_list, i[0],pileofstone_hig)
+                                  overlay(frame, ar_list, i[0],assets.get('pileofstone_hig'))
                                   
                                   
 
                           if i[0] == 2:
-                                  overlay(frame, ar_list, i[0],waterpitcher_low)
+                                  overlay(frame, ar_list, i[0],assets.get('waterpitcher_low'))
                                   time.sleep(3)
-                                  overlay(frame, ar_list, i[0],waterpitcher_med)
+                                  overlay(frame, ar_list, i[0],assets.get('waterpitcher_med'))
                                   time.sleep(3)
                                   
 
@@ -196,41 +264,11 @@ Purpose: This function takes the image in form of a numpy array, camera_matrix a
          distortion matrix as input and detects ArUco markers in the image. For each
          ArUco marker detected in image, paramters such as ID, centre coord, rvec
          and tvec are calculated and stored in a list in a prescribed format. The list
-         is returned as output for the function
+         is returned as output for the function. The dictionary, parameters and
+         calibration live in the MarkerDetector built by getCameraMatrix().
 """
 def detect_markers(img):
-        markerLength = 100
-        aruco_list = []
-        ######################## INSERT CODE HERE ########################
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        aruco_dict = aruco.Dictionary_get(aruco.DICT_5X5_250)
-
-        parameters = aruco.DetectorParameters_create()
-        corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-        global Xc,Yc
-
-        with np.load('Camera.npz') as X:
-              camera_matrix, dist_coeff, _, _ = [X[i] for i in ('mtx','dist','rvecs','tvecs')]
-              corners, ids, _ = aruco.detectMarkers(gray, aruco_dict, parameters = parameters)
-              rvec, tvec,_= aruco.estimatePoseSingleMarkers(corners, markerLength, camera_matrix, dist_coeff)
-
-              j=0
-              if ids is not None:
-                      for i in ids:
-
-
-                              Xc=(corners[j][0][0][0]+corners[j][0][1][0]+corners[j][0][2][0]+corners[j][0][3][0])/4
-                              Yc=(corners[j][0][0][1]+corners[j][0][1][1]+corners[j][0][2][1]+corners[j][0][3][1])/4
-                              aruco_centre=(Xc,Yc)
-
-                              rvect = np.array([rvec[j].reshape(1,1,3)])
-                              tvect = np.array([tvec[j].reshape(1,1,3)])
-                              tup1 = (int(i),aruco_centre,rvect[0],tvect[0])
-                              aruco_list.append(tup1)
-                              j=j+1
-
-        return aruco_list
+        return detector.detect(img)
 ########################################################################
 
 
@@ -241,9 +279,13 @@ Function Name : draw_background()
 Input: img (numpy array)
 Output: None
 Purpose: Takes image as input and converts it into an OpenGL texture. That
-         OpenGL texture is then set as background of the OpenGL scene
+         OpenGL texture is then set as background of the OpenGL scene. With
+         UNDISTORT_BACKGROUND set the frame is first undistorted using the
+         cached remap tables of the calibration.
 """
 def draw_background(img):
+        if UNDISTORT_BACKGROUND:
+                img = calibration.undistort(img)
 
         imageData= cv2.flip(img,0)
         imageData=cv2.cvtColor(imageData, cv2.COLOR_BGR2RGB)
@@ -343,23 +385,20 @@ Output: None
 Purpose: Receives the ArUco information as input and overlays the 3D Model of a teapot
          on the ArUco marker. That ArUco information is used to
          calculate the rotation matrix and subsequently the view matrix. Then that view matrix
-         is loaded as current matrix and the 3D model is rendered.
+         is loaded as current matrix and the 3D model is rendered. The marker
+         is looked up by id through detect.marker_index(), so any number of
+         markers can be in view.
 
          Parts of this code are already completed, you just need to fill in the blanks. You may
          however add your own code in this function.
 """
 def overlay(img, ar_list, ar_id, object_file):
-        if(ar_list[0][0]==ar_id):
-                index = 0
-
-        elif(ar_list[1][0]==ar_id):
-                index = 1
-
-        elif(ar_list[2][0]==ar_id):
-                index = 2
+        if object_file is None:
+                return
+        marker = marker_index(ar_list)[ar_id]
 
         if(ar_id == 0):
-                centre, rvec, tvec = ar_list[index][1], ar_list[index][2], ar_list[index][3]
+                centre, rvec, tvec = marker[1], marker[2], marker[3]
                 rmtx = cv2.Rodrigues(rvec)[0]
                 tmtx = cv2.Rodrigues(tvec)[0]
 
@@ -373,7 +412,7 @@ def overlay(img, ar_list, ar_id, object_file):
                 view_matrix = np.transpose(view_matrix)
                 glPushMatrix()
                 glLoadMatrixd(view_matrix)
-                glCallList(object_file.gl_list)
+                object_file.render()
                 glPopMatrix()
                 
 
@@ -396,7 +435,7 @@ def overlay(img, ar_list, ar_id, object_file):
 
 
         elif(ar_id == 2):
-                centre, rvec, tvec = ar_list[index][1], ar_list[index][2], ar_list[index][3]
+                centre, rvec, tvec = marker[1], marker[2], marker[3]
                 rmtx = cv2.Rodrigues(rvec)[0]
                 tmtx = cv2.Rodrigues(tvec)[0]
 
@@ -409,7 +448,7 @@ def overlay(img, ar_list, ar_id, object_file):
                 view_matrix = np.transpose(view_matrix)
                 glPushMatrix()
                 glLoadMatrixd(view_matrix)
-                glCallList(object_file.gl_list)
+                object_file.render()
                 glPopMatrix()
                 
 
@@ -0,0 +1,118 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: pipeline.py
+*  Team: eYRC#TC#1155
+*
+*  Capture -> detect -> render in stages. ArUco detection runs on a worker
+*  thread so the GL thread can draw frame N while frame N+1 is detected.
+*
+**************************************************************************
+"""
+
+import threading
+import queue
+
+
+"""
+Class Name : DetectionPipeline
+Input: grabber (capture.FrameGrabber), detector (detect.MarkerDetector),
+       queue_size (results waiting for the GL thread)
+Purpose: Worker thread takes the newest frame from the grabber, runs detection
+         and pushes (frame, timestamp, ar_list) into a bounded queue. When the
+         GL thread falls behind the oldest result is thrown away instead of
+         blocking the worker, and counted in results_dropped. OpenCV releases
+         the GIL while detecting, so a thread is enough to use a second core.
+"""
+class DetectionPipeline:
+        def __init__(self, grabber, detector, queue_size=1):
+                self.grabber = grabber
+                self.detector = detector
+                self.results = queue.Queue(maxsize=queue_size)
+                self.thread = None
+                self.running = False
+                self.frames_detected = 0
+                self.results_dropped = 0
+
+        """
+        Function Name : start()
+        Input: None
+        Output: self
+        Purpose: Starts the grabber (if needed) and the detection worker.
+        """
+        def start(self):
+                self.grabber.start()
+                if self.thread is None:
+                        self.running = True
+                        self.thread = threading.Thread(target=self.run, daemon=True)
+                        self.thread.start()
+                return self
+
+        """
+        Function Name : run()
+        Input: None
+        Output: None
+        Purpose: Detection loop of the worker thread.
+        """
+        def run(self):
+                while self.running:
+                        frame, stamp = self.grabber.latest(timeout=0.5)
+                        if frame is None:
+                                if not self.grabber.running:
+                                        break
+                                continue
+                        ar_list = self.detector.detect(frame)
+                        self.frames_detected += 1
+                        self.put((frame, stamp, ar_list))
+                self.running = False
+
+        """
+        Function Name : put()
+        Input: result tuple
+        Output: None
+        Purpose: Adds a result, dropping the oldest one if the queue is full.
+        """
+        def put(self, result):
+                while True:
+                        try:
+                                self.results.put_nowait(result)
+                                return
+                        except queue.Full:
+                                try:
+                                        self.results.get_nowait()
+                                        self.results_dropped += 1
+                                except queue.Empty:
+                                        pass
+
+        """
+        Function Name : latest()
+        Input: timeout (seconds to wait for a result)
+        Output: frame, timestamp, ar_list (None, None, [] if nothing is ready)
+        Purpose: Called from the GL thread, returns the newest detected frame.
+        """
+        def latest(self, timeout=None):
+                try:
+                        result = self.results.get(timeout=timeout)
+                except queue.Empty:
+                        return None, None, []
+                while True:
+                        try:
+                                result = self.results.get_nowait()
+                                self.results_dropped += 1
+                        except queue.Empty:
+                                return result
+
+        """
+        Function Name : stop()
+        Input: None
+        Output: None
+        Purpose: Stops the worker and releases the grabber.
+        """
+        def stop(self):
+                self.running = False
+                if self.thread is not None:
+                        self.thread.join()
+                        self.thread = None
+                self.grabber.release()
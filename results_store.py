@@ -0,0 +1,269 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: results_store.py
+*  Team: eYRC#TC#1155
+*
+*  Columnar store for detection results. Every column (frame, id, centre,
+*  rvec, tvec) is a raw fixed dtype file in one folder, so it can be
+*  memory mapped and new frames are appended at the end. offsets holds
+*  where each frame's rows start. Results.npz files saved by TestSuite.py
+*  can be converted, and two stores are compared with numpy, without a
+*  loop over the markers.
+*
+*  python results_store.py convert Results.npz Results.store
+*  python results_store.py compare Reference.store Results.store
+*
+**************************************************************************
+"""
+
+import argparse
+import os
+import re
+import numpy as np
+
+"""
+COLUMNS
+dtype and row shape of each column file. offsets has one more entry than
+there are frames, frame j is rows offsets[j] to offsets[j+1].
+"""
+COLUMNS = {
+        'frame': (np.int32, ()),
+        'id': (np.int32, ()),
+        'centre': (np.float32, (2,)),
+        'rvec': (np.float64, (3,)),
+        'tvec': (np.float64, (3,)),
+}
+
+
+"""
+Class Name : ResultStore
+Input: path of the store folder (created if missing)
+Purpose: Appends the markers of each frame to the column files and reads the
+         columns back as read-only memory maps. offsets is written after the
+         columns, so a reader only ever sees complete frames. Only one process
+         should append to a store at a time.
+"""
+class ResultStore:
+        def __init__(self, path):
+                self.path = path
+                if not os.path.isdir(path):
+                        os.makedirs(path)
+                if not os.path.exists(self.file('offsets')):
+                        np.zeros(1, np.int64).tofile(self.file('offsets'))
+                self.frames = None
+                self.rows = None
+
+        """
+        Function Name : file()
+        Input: name of the column
+        Output: path of its file
+        """
+        def file(self, name):
+                return os.path.join(self.path, name + ('.txt' if name == 'names' else '.bin'))
+
+        """
+        Function Name : offsets()
+        Output: offsets (frames + 1,) of the complete frames
+        """
+        def offsets(self):
+                return np.fromfile(self.file('offsets'), np.int64)
+
+        """
+        Function Name : names()
+        Output: list of the frame names, in order
+        """
+        def names(self):
+                if not os.path.exists(self.file('names')):
+                        open(self.file('names'), 'w').close()
+                with open(self.file('names')) as f:
+                        return f.read().splitlines()[:len(self)]
+
+        def __len__(self):
+                return len(self.offsets()) - 1
+
+        """
+        Function Name : column()
+        Input: name of the column
+        Output: read-only memory map of the column (rows, ...)
+        """
+        def column(self, name):
+                dtype, shape = COLUMNS[name]
+                rows = int(self.offsets()[-1])
+                if rows == 0:
+                        return np.zeros((0,) + shape, dtype)
+                return np.memmap(self.file(name), dtype, 'r', shape=(rows,) + shape)
+
+        """
+        Function Name : columns()
+        Output: dict of all the columns, and 'offsets'
+        """
+        def columns(self):
+                data = dict((name, self.column(name)) for name in COLUMNS)
+                data['offsets'] = self.offsets()
+                return data
+
+        """
+        Function Name : repair()
+        Input: None
+        Output: None
+        Purpose: Cuts off the rows and the name of a frame whose append did not
+                 finish, so the next append lines up with offsets again. Runs
+                 before the first append, never for a store that is only read.
+        """
+        def repair(self):
+                offsets = self.offsets()
+                self.frames, self.rows = len(offsets) - 1, int(offsets[-1])
+                for column, (dtype, shape) in COLUMNS.items():
+                        size = self.rows*np.dtype((dtype, shape)).itemsize
+                        with open(self.file(column), 'ab') as f:
+                                if f.tell() != size:
+                                        f.truncate(size)
+                names = self.names()
+                if os.path.getsize(self.file('names')) != len(''.join(name + '\n' for name in names).encode()):
+                        with open(self.file('names'), 'w') as f:
+                                f.write(''.join(name + '\n' for name in names))
+
+        """
+        Function Name : append()
+        Input: markers (marker table from detect, aruco list or a Results.npz
+               entry), name of the frame
+        Output: index of the new frame
+        """
+        def append(self, markers, name=''):
+                if self.frames is None:
+                        self.repair()
+                ids, centre, rvec, tvec = marker_columns(markers)
+                data = {'frame': np.full(len(ids), self.frames, np.int32), 'id': ids, 'centre': centre,
+                        'rvec': rvec, 'tvec': tvec}
+                for column, (dtype, _) in COLUMNS.items():
+                        with open(self.file(column), 'ab') as f:
+                                np.ascontiguousarray(data[column], dtype).tofile(f)
+                with open(self.file('names'), 'a') as f:
+                        f.write(str(name).replace('\n', ' ') + '\n')
+                with open(self.file('offsets'), 'ab') as f:
+                        np.array([self.rows + len(ids)], np.int64).tofile(f)
+                self.frames += 1
+                self.rows += len(ids)
+                return self.frames - 1
+
+        """
+        Function Name : frame()
+        Input: index of the frame
+        Output: dict of the columns of that frame
+        """
+        def frame(self, index):
+                offsets = self.offsets()
+                rows = slice(int(offsets[index]), int(offsets[index + 1]))
+                return dict((name, self.column(name)[rows]) for name in COLUMNS)
+
+
+"""
+Function Name : marker_columns()
+Input: markers (marker table, aruco list or a Results.npz entry)
+Output: ids (N,), centre (N,2), rvec (N,3), tvec (N,3)
+"""
+def marker_columns(markers):
+        if isinstance(markers, np.ndarray) and markers.dtype.names:
+                return (markers['id'].astype(np.int32), markers['centre'].reshape(-1,2),
+                        markers['rvec'].reshape(-1,3), markers['tvec'].reshape(-1,3))
+        rows = list(markers.reshape(-1,4)) if isinstance(markers, np.ndarray) else list(markers)
+        ids = np.array([int(r[0]) for r in rows], np.int32)
+        centre = np.array([np.asarray(r[1], np.float32).reshape(2) for r in rows], np.float32).reshape(-1,2)
+        rvec = np.array([np.asarray(r[2], np.float64).reshape(3) for r in rows]).reshape(-1,3)
+        tvec = np.array([np.asarray(r[3], np.float64).reshape(3) for r in rows]).reshape(-1,3)
+        return ids, centre, rvec, tvec
+
+"""
+Function Name : convert_results()
+Input: path of a Results.npz saved by TestSuite.py, path of the new store,
+       append (add the frames to a store that already has some)
+Output: ResultStore with one frame per image, in image number order
+Purpose: Converting into a store that already has frames would repeat them,
+         so that raises ValueError unless append is set.
+"""
+def convert_results(npz_path, store_path, append=False):
+        store = ResultStore(store_path)
+        if len(store) and not append:
+                raise ValueError('%s already has %d frames, use --append to add to them' % (store_path, len(store)))
+        with np.load(npz_path, allow_pickle=True) as X:
+                keys = sorted(X.files, key=lambda k: [int(t) if t.isdigit() else t for t in re.split(r'(\d+)', k)])
+                for key in keys:
+                        store.append(X[key], key)
+        return store
+
+"""
+Function Name : rvec_error()
+Input: reference rvecs (N,3), rvecs to check (N,3)
+Output: largest component difference (N,) of each pair, after writing each
+        checked rvec as r or r - 2*pi*r/|r| (the same rotation), whichever is
+        closer to the reference
+"""
+def rvec_error(ref, test):
+        ref = np.asarray(ref, np.float64).reshape(-1,3)
+        test = np.asarray(test, np.float64).reshape(-1,3)
+        angle = np.linalg.norm(test, axis=1, keepdims=True)
+        other = test - 2*np.pi*test/np.maximum(angle, 1e-12)
+        return np.minimum(np.abs(ref - test).max(axis=1), np.abs(ref - other).max(axis=1))
+
+"""
+Function Name : compare_stores()
+Input: reference and test stores (ResultStore or dicts from columns())
+Output: dict with matched, missed and extra marker counts, the errors of every
+        matched marker (frame, id, centre px, rvec rad, tvec % of distance) and
+        the largest of each error
+Purpose: Matches the markers of both stores on (frame, id) with one sorted
+         intersection and computes all the errors at once.
+"""
+def compare_stores(ref, test):
+        ref = ref.columns() if isinstance(ref, ResultStore) else ref
+        test = test.columns() if isinstance(test, ResultStore) else test
+        ref_keys = ref['frame'].astype(np.int64) << 32 | ref['id'].astype(np.int64)
+        test_keys = test['frame'].astype(np.int64) << 32 | test['id'].astype(np.int64)
+        common, ri, ti = np.intersect1d(ref_keys, test_keys, return_indices=True)
+        centre = np.abs(ref['centre'][ri] - test['centre'][ti]).max(axis=1) if len(common) else np.zeros(0)
+        rvec = rvec_error(ref['rvec'][ri], test['rvec'][ti])
+        dist = np.linalg.norm(ref['tvec'][ri], axis=1)
+        tvec = np.linalg.norm(ref['tvec'][ri] - test['tvec'][ti], axis=1)/np.maximum(dist, 1e-12)*100
+        return {'matched': len(common), 'missed': len(ref_keys) - len(common), 'extra': len(test_keys) - len(common),
+                'frame': (common >> 32).astype(np.int32), 'id': (common & 0xffffffff).astype(np.int32),
+                'centre': centre, 'rvec': rvec, 'tvec': tvec,
+                'max_centre': float(centre.max()) if len(common) else 0.0,
+                'max_rvec': float(rvec.max()) if len(common) else 0.0,
+                'max_tvec': float(tvec.max()) if len(common) else 0.0}
+
+"""
+Function Name : main()
+Purpose: Converts Results.npz files and compares stores from the command line.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Columnar detection results store.')
+        commands = parser.add_subparsers(dest='command')
+        convert = commands.add_parser('convert', help='convert a Results.npz')
+        convert.add_argument('results')
+        convert.add_argument('store')
+        convert.add_argument('--append', action='store_true', help='add the frames to an existing store')
+        compare = commands.add_parser('compare', help='compare a store with a reference store')
+        compare.add_argument('reference')
+        compare.add_argument('store')
+        args = parser.parse_args()
+
+        if args.command == 'convert':
+                try:
+                        store = convert_results(args.results, args.store, args.append)
+                except ValueError as e:
+                        raise SystemExit(str(e))
+                print('%d frames, %d markers in %s' % (len(store), store.offsets()[-1], args.store))
+        elif args.command == 'compare':
+                result = compare_stores(ResultStore(args.reference), ResultStore(args.store))
+                print('matched %d missed %d extra %d  centre %.2f px  rvec %.3f  tvec %.2f %%' %
+                      (result['matched'], result['missed'], result['extra'], result['max_centre'],
+                       result['max_rvec'], result['max_tvec']))
+        else:
+                parser.print_help()
+
+
+if __name__ == "__main__":
+        main()
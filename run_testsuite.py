@@ -0,0 +1,228 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: run_testsuite.py
+*  Team: eYRC#TC#1155
+*
+*  Runs the Task 1.1 TestSuite over a folder of test images and saves the
+*  same outputs (drawAxis/axisN.jpg, drawCube/cubeN.jpg,
+*  drawCylinder/cylinderN.jpg and Results.npz). The images are processed
+*  on a process pool, every output is encoded once in the worker and
+*  written by a background writer pool. Images whose file content and
+*  detector version did not change since the last run are skipped.
+*
+*  python run_testsuite.py --images "Task 1/Task 1.1/TestCases"
+*                          --camera Camera.npz --out SavedResults
+*
+**************************************************************************
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import cv2
+import detect
+from scene import axis_model, cube_model, cylinder_model, draw_markers
+
+"""
+OUTPUTS
+Folder and file prefix of each drawn output, and the model drawn in it.
+"""
+OUTPUTS = [('drawAxis', 'axis', axis_model), ('drawCube', 'cube', cube_model),
+           ('drawCylinder', 'cylinder', cylinder_model)]
+CACHE_FILE = 'testsuite_cache.npz'
+# files whose content changes what the suite produces, next to detect.py
+VERSION_FILES = ['detect.py', 'scene.py']
+
+camera_matrix = None
+dist_coeff = None
+profile = None
+
+
+"""
+Function Name : file_hash()
+Input: path
+Output: sha1 hex digest of the file content
+"""
+def file_hash(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+        return digest.hexdigest()
+
+"""
+Function Name : detector_version()
+Input: camera (calibration file), profile (absolute path of the detector
+       profile the workers apply, or None)
+Output: hash of the detector source, the profile and the calibration
+"""
+def detector_version(camera, profile=None):
+        digest = hashlib.sha1()
+        folder = os.path.dirname(os.path.abspath(detect.__file__))
+        for path in [os.path.join(folder, name) for name in VERSION_FILES] + [camera]:
+                if os.path.exists(path):
+                        digest.update(file_hash(path).encode())
+        digest.update(('profile %s %s' % (profile, file_hash(profile) if profile else '')).encode())
+        return digest.hexdigest()
+
+"""
+Function Name : image_number()
+Input: path of a test image
+Output: the N of image_N.jpg, or the file name without extension
+"""
+def image_number(path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        match = re.match(r'^image_(\d+)$', name)
+        return match.group(1) if match else name
+
+"""
+Function Name : output_paths()
+Input: out folder, image number
+Output: paths of the axis, cube and cylinder images
+"""
+def output_paths(out, number):
+        return [os.path.join(out, folder, prefix + number + '.jpg') for folder, prefix, _ in OUTPUTS]
+
+"""
+Function Name : init_worker()
+Input: camera (calibration file), profile (detector profile file or None)
+Output: None
+Purpose: Loads the calibration once in every worker process.
+"""
+def init_worker(camera, detector_profile=None):
+        global camera_matrix, dist_coeff, profile
+        with np.load(camera) as X:
+                camera_matrix, dist_coeff = X['mtx'], X['dist']
+        profile = detector_profile
+
+"""
+Function Name : process_image()
+Input: path of a test image
+Output: (aruco list, list of encoded jpg outputs, empty if nothing is drawn)
+Purpose: What TestSuite.py does for one image, run in a worker. Each output is
+         drawn with all the markers and encoded once.
+"""
+def process_image(path):
+        image = cv2.imread(path)
+        ar = detect.detect_markers(image, camera_matrix, dist_coeff, profile=profile)
+        encoded = []
+        if len(ar) and check_ar_list_type(ar):
+                for _, _, model in OUTPUTS:
+                        drawn = draw_markers(image.copy(), ar, [model()], camera_matrix, dist_coeff)
+                        encoded.append(cv2.imencode('.jpg', drawn)[1].tobytes())
+        return list(ar), encoded
+
+"""
+Function Name : check_ar_list_type()
+Input: aruco list
+Output: True if the list is in the format TestSuite.py expects
+"""
+def check_ar_list_type(ar_list):
+        for k in ar_list:
+                if not (isinstance(k, tuple) and len(k) == 4 and isinstance(k[1], tuple) and len(k[1]) == 2
+                        and isinstance(k[2], np.ndarray) and k[2].shape == (1,1,3)
+                        and isinstance(k[3], np.ndarray) and k[3].shape == (1,1,3)):
+                        return False
+        return True
+
+"""
+Function Name : write_file()
+Input: path, data (bytes)
+Output: None
+"""
+def write_file(path, data):
+        with open(path, 'wb') as f:
+                f.write(data)
+
+"""
+Function Name : load_cache()
+Input: out folder
+Output: dict of image path to (input hash, detector version), and the aruco
+        lists of the last Results.npz by image number
+"""
+def load_cache(out):
+        cache, results = {}, {}
+        try:
+                with np.load(os.path.join(out, CACHE_FILE)) as X:
+                        cache = dict((str(p), (str(h), str(v))) for p, h, v in zip(X['paths'], X['hashes'], X['versions']))
+                with np.load(os.path.join(out, 'Results.npz'), allow_pickle=True) as X:
+                        results = dict((key[len('image'):], X[key]) for key in X.files)
+        except (IOError, ValueError, KeyError):
+                return {}, {}
+        return cache, results
+
+"""
+Function Name : run_suite()
+Input: paths of the test images, camera (calibration file), out folder,
+       workers (processes), writers (writer threads), profile (detector
+       profile file, the aruco defaults if None)
+Output: number of images processed and skipped
+"""
+def run_suite(paths, camera, out, workers=None, writers=4, profile=None):
+        # the same absolute path is hashed and loaded
+        profile = os.path.abspath(profile) if profile is not None else None
+        for folder, _, _ in OUTPUTS:
+                if not os.path.isdir(os.path.join(out, folder)):
+                        os.makedirs(os.path.join(out, folder))
+        version = detector_version(camera, profile)
+        cache, old_results = load_cache(out)
+        hashes = dict((path, file_hash(path)) for path in paths)
+        results = {}
+        todo = []
+        for path in paths:
+                number = image_number(path)
+                outputs_exist = all(os.path.exists(p) for p in output_paths(out, number))
+                if (cache.get(path) == (hashes[path], version) and number in old_results
+                    and (outputs_exist or len(old_results[number]) == 0)):
+                        results[number] = old_results[number]
+                else:
+                        todo.append(path)
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(camera, profile)) as pool, \
+             ThreadPoolExecutor(writers) as writer:
+                writes = []
+                for path, (ar, encoded) in zip(todo, pool.map(process_image, todo, chunksize=4)):
+                        number = image_number(path)
+                        for target, data in zip(output_paths(out, number), encoded):
+                                writes.append(writer.submit(write_file, target, data))
+                        results[number] = np.array(ar, dtype=object)
+                for write in writes:
+                        write.result()
+        order = sorted(results, key=lambda n: (not n.isdigit(), int(n) if n.isdigit() else 0, n))
+        np.savez(os.path.join(out, 'Results.npz'), **dict(('image' + n, results[n]) for n in order))
+        np.savez(os.path.join(out, CACHE_FILE), paths=np.array(paths), versions=np.array([version]*len(paths)),
+                 hashes=np.array([hashes[p] for p in paths]))
+        return len(todo), len(paths) - len(todo)
+
+"""
+Function Name : main()
+Purpose: Parses the command line and runs the suite.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Run the TestSuite in parallel with a cache.')
+        parser.add_argument('--images', default=os.path.join('Task 1', 'Task 1.1', 'TestCases'))
+        parser.add_argument('--camera', default='Camera.npz', help='calibration file')
+        parser.add_argument('--out', default='SavedResults')
+        parser.add_argument('--workers', type=int, default=None, help='processes, one per core by default')
+        parser.add_argument('--writers', type=int, default=4, help='threads writing the outputs')
+        parser.add_argument('--profile', nargs='?', const=detect.PROFILE_FILE, default=None,
+                            help='apply a detector profile of tune_detector.py (detect.PROFILE_FILE if no path)')
+        args = parser.parse_args()
+
+        paths = sorted(glob.glob(os.path.join(args.images, '*.jpg')))
+        if not paths:
+                raise SystemExit('no images found in ' + args.images)
+        start = time.perf_counter()
+        done, skipped = run_suite(paths, args.camera, args.out, args.workers, args.writers, args.profile)
+        print('%d images processed, %d unchanged and skipped, %.2f s' % (done, skipped, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+        main()
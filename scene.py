@@ -0,0 +1,155 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: scene.py
+*  Team: eYRC#TC#1155
+*
+*  Wireframe models (axis, cube, cylinder) drawn on the ArUco markers.
+*  Each model is a vertex array and an edge array built once. All the
+*  models on all the markers of a frame are projected with one
+*  cv2.projectPoints call and drawn with one cv2.polylines call per colour.
+*
+**************************************************************************
+"""
+
+import math
+import numpy as np
+import cv2
+
+
+"""
+Class Name : Wireframe
+Input: vertices (V,3) in marker coordinates, edges (E,2) vertex indices,
+       colours (E,3) BGR colour of each edge, outlines (O,K) vertex indices of
+       closed outlines, outline_colours (O,3)
+Purpose: Geometry of one model, shared by every marker it is drawn on.
+         Outlines are drawn like cv2.drawContours, on the truncated image points.
+"""
+class Wireframe:
+        def __init__(self, vertices, edges, colours, outlines=(), outline_colours=()):
+                self.vertices = np.asarray(vertices, np.float32).reshape(-1,3)
+                self.edges = np.asarray(edges, np.int32).reshape(-1,2)
+                self.colours = np.asarray(colours, np.int32).reshape(-1,3)
+                self.outlines = [np.asarray(o, np.int32) for o in outlines]
+                self.outline_colours = np.asarray(outline_colours, np.int32).reshape(-1,3)
+
+"""
+MODELS
+Models already built, by (kind, marker_length, segments).
+"""
+MODELS = {}
+
+
+"""
+Function Name : axis_model()
+Input: marker_length
+Output: Wireframe of the three axes from the top left corner of the marker,
+        x green, y blue and z red
+"""
+def axis_model(marker_length=100):
+        key = ('axis', marker_length, 0)
+        if key not in MODELS:
+                m = marker_length/2
+                MODELS[key] = Wireframe([[-m,m,0],[m,m,0],[-m,-m,0],[-m,m,m]], [[0,1],[0,2],[0,3]],
+                                        [(0,255,0),(255,0,0),(0,0,255)])
+        return MODELS[key]
+
+"""
+Function Name : cube_model()
+Input: marker_length
+Output: Wireframe of a red cube standing on the marker
+"""
+def cube_model(marker_length=100):
+        key = ('cube', marker_length, 0)
+        if key not in MODELS:
+                m = marker_length/2
+                square = [[-m,m],[m,m],[m,-m],[-m,-m]]
+                vertices = [[x,y,0] for x, y in square] + [[x,y,m] for x, y in square]
+                edges = [[i,(i + 1) % 4] for i in range(4)] + [[4 + i,4 + (i + 1) % 4] for i in range(4)] + \
+                        [[i,4 + i] for i in range(4)]
+                MODELS[key] = Wireframe(vertices, edges, [(0,0,255)]*len(edges))
+        return MODELS[key]
+
+"""
+Function Name : cylinder_model()
+Input: marker_length, segments (number of sides of the rims)
+Output: Wireframe of a blue cylinder standing on the marker, with radius half
+        the marker length and height 1.5 marker lengths: the spokes from the
+        rim centres, the centre axis, the vertical sides and both rims as
+        outlines, the same lines drawCylinder used to draw one by one
+"""
+def cylinder_model(marker_length=100, segments=12):
+        key = ('cylinder', marker_length, segments)
+        if key not in MODELS:
+                r = marker_length/2; h = marker_length*1.5
+                angles = 2*math.pi*np.arange(segments)/segments
+                rim = np.stack([r*np.sin(angles), r*np.cos(angles)], axis=1)
+                # vertex 0 and 1 are the rim centres, then the bottom and the top rim
+                vertices = np.vstack([[[0,0,0],[0,0,h]],
+                                      np.hstack([rim, np.zeros((segments,1))]),
+                                      np.hstack([rim, np.full((segments,1), h)])])
+                bottom = 2 + np.arange(segments)
+                top = bottom + segments
+                edges = np.vstack([np.stack([np.zeros(segments, int), bottom], axis=1),
+                                   np.stack([np.ones(segments, int), top], axis=1),
+                                   [[1,0]],
+                                   np.stack([bottom, top], axis=1)])
+                MODELS[key] = Wireframe(vertices, edges, [(255,0,0)]*len(edges), [bottom, top], [(255,0,0)]*2)
+        return MODELS[key]
+
+"""
+Function Name : project_models()
+Input: items (list of (Wireframe, rvec, tvec)), camera_matrix, dist_coeff
+Output: list of (V,2) image points, one per item
+Purpose: Moves the vertices of every item into camera coordinates with numpy
+         and projects them all with a single cv2.projectPoints call.
+"""
+def project_models(items, camera_matrix, dist_coeff):
+        if not items:
+                return []
+        points = []
+        for model, rvec, tvec in items:
+                rotation = cv2.Rodrigues(np.asarray(rvec, np.float64).reshape(3,1))[0]
+                points.append(model.vertices.dot(rotation.T) + np.asarray(tvec, np.float64).reshape(1,3))
+        counts = np.cumsum([len(p) for p in points])[:-1]
+        imgpts, _ = cv2.projectPoints(np.vstack(points), np.zeros(3), np.zeros(3), camera_matrix, dist_coeff)
+        return np.split(imgpts.reshape(-1,2), counts)
+
+"""
+Function Name : draw_models()
+Input: img (numpy array), items (list of (Wireframe, rvec, tvec)), camera_matrix,
+       dist_coeff, thickness
+Output: img (numpy array)
+Purpose: Projects all the items at once and draws their edges with one
+         cv2.polylines call per colour, then the outlines.
+"""
+def draw_models(img, items, camera_matrix, dist_coeff, thickness=4):
+        projected = project_models(items, camera_matrix, dist_coeff)
+        if not projected:
+                return img
+        lines = np.vstack([imgpts[model.edges] for (model, _, _), imgpts in zip(items, projected)])
+        colours = np.vstack([model.colours for model, _, _ in items])
+        lines = np.round(lines).astype(np.int32)
+        keys = (colours[:,0] << 16) | (colours[:,1] << 8) | colours[:,2]
+        # keep the order the colours first appear in, so later models draw on top
+        _, first = np.unique(keys, return_index=True)
+        for k in np.sort(first):
+                same = keys == keys[k]
+                img = cv2.polylines(img, list(lines[same]), False, tuple(int(c) for c in colours[k]), thickness)
+        for (model, _, _), imgpts in zip(items, projected):
+                for outline, colour in zip(model.outlines, model.outline_colours):
+                        img = cv2.polylines(img, [imgpts[outline].astype(np.int32)], True, tuple(int(c) for c in colour), thickness)
+        return img
+
+"""
+Function Name : draw_markers()
+Input: img (numpy array), ar_list, models (list of Wireframe), camera_matrix,
+       dist_coeff, ids (markers to draw on, all of ar_list if None)
+Output: img (numpy array)
+Purpose: Draws the models on every marker of the frame in one batch.
+"""
+def draw_markers(img, ar_list, models, camera_matrix, dist_coeff, ids=None):
+        items = [(model, x[2], x[3]) for x in ar_list if ids is None or x[0] in ids for model in models]
+        return draw_models(img, items, camera_matrix, dist_coeff)
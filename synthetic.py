@@ -0,0 +1,272 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: synthetic.py
+*  Team: eYRC#TC#1155
+*
+*  Synthetic ArUco frames for benchmarking the detector on thousands of
+*  images. Markers of the DICT_5X5 dictionary are placed at random poses in
+*  front of the camera of Camera.npz and drawn into the frame with
+*  cv2.warpPerspective, over a generated or loaded background. Blur, noise
+*  and lighting changes are added. The ground truth poses go into a
+*  results_store.ResultStore. Frames are made on a process pool and
+*  streamed, nothing has to be written to disk.
+*
+*  python synthetic.py --camera Camera.npz --count 2000 --truth truth.store
+*                      --save synthetic_frames
+*
+**************************************************************************
+"""
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from detect import make_marker_table
+from results_store import ResultStore
+
+"""
+Class Name : SceneConfig
+Input: camera_matrix, dist_coeff, size (width, height), dictionary, ids (marker
+       ids to draw), marker_length, markers (min, max per frame), distance
+       (min, max in the units of marker_length), max_tilt (degrees), blur
+       (max gaussian sigma), noise (max std of the gaussian noise), backgrounds
+       (paths of background images, generated backgrounds if empty)
+Purpose: Everything a worker needs to make a frame. It is sent to every worker
+         once.
+"""
+class SceneConfig:
+        def __init__(self, camera_matrix, dist_coeff, size=(640,480), dictionary=aruco.DICT_5X5_250,
+                     ids=None, marker_length=100, markers=(1,4), distance=(250,1000), max_tilt=55.0,
+                     blur=2.0, noise=8.0, backgrounds=()):
+                self.camera_matrix = camera_matrix
+                self.dist_coeff = dist_coeff
+                self.size = size
+                self.dictionary = dictionary
+                self.ids = ids
+                self.marker_length = marker_length
+                self.markers = markers
+                self.distance = distance
+                self.max_tilt = max_tilt
+                self.blur = blur
+                self.noise = noise
+                self.backgrounds = list(backgrounds)
+
+config = None
+marker_images = {}
+
+
+"""
+Function Name : init_worker()
+Input: scene config
+Output: None
+Purpose: Keeps the config in the worker process.
+"""
+def init_worker(scene_config):
+        global config
+        config = scene_config
+        marker_images.clear()
+
+"""
+Function Name : marker_image()
+Input: marker id
+Output: gray marker image with a one cell white border, cell size in pixels
+"""
+def marker_image(marker_id):
+        if marker_id not in marker_images:
+                aruco_dict = aruco.Dictionary_get(config.dictionary)
+                cell = 24
+                side = (aruco_dict.markerSize + 2)*cell
+                marker = aruco.drawMarker(aruco_dict, marker_id, side)
+                marker_images[marker_id] = (cv2.copyMakeBorder(marker, cell, cell, cell, cell,
+                                                                cv2.BORDER_CONSTANT, value=255), cell)
+        return marker_images[marker_id]
+
+"""
+Function Name : background()
+Input: rng (numpy RandomState)
+Output: BGR background frame of config.size
+"""
+def background(rng):
+        w, h = config.size
+        if config.backgrounds:
+                img = cv2.imread(config.backgrounds[rng.randint(len(config.backgrounds))])
+                if img is not None:
+                        return cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+        # smooth colour blobs with some texture, like a floor or a table
+        small = rng.randint(40, 220, (rng.randint(2, 6), rng.randint(2, 6), 3)).astype(np.uint8)
+        img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+        texture = np.empty((h, w), np.float32)
+        cv2.randn(texture, 0, 25)
+        texture = cv2.GaussianBlur(texture, (0, 0), rng.uniform(0.5, 3.0))
+        return np.clip(img + texture[:,:,None], 0, 255).astype(np.uint8)
+
+"""
+Function Name : random_pose()
+Input: rng
+Output: rvec (3,), tvec (3,) of a marker facing the camera, tilted by at most
+        config.max_tilt, whose centre lies inside the frame
+"""
+def random_pose(rng):
+        w, h = config.size
+        z = rng.uniform(*config.distance)
+        u, v = rng.uniform(0.1*w, 0.9*w), rng.uniform(0.1*h, 0.9*h)
+        ray = np.linalg.inv(config.camera_matrix).dot([u, v, 1.0])
+        tvec = ray/ray[2]*z
+        # marker z axis points at the camera, tilted around a random axis in the marker plane
+        tilt = np.radians(rng.uniform(0, config.max_tilt))
+        axis = rng.uniform(0, 2*np.pi)
+        flip = cv2.Rodrigues(np.array([np.pi, 0.0, 0.0]))[0]
+        spin = cv2.Rodrigues(np.array([0.0, 0.0, rng.uniform(0, 2*np.pi)]))[0]
+        lean = cv2.Rodrigues(tilt*np.array([np.cos(axis), np.sin(axis), 0.0]))[0]
+        return cv2.Rodrigues(lean.dot(flip).dot(spin))[0].reshape(3), tvec
+
+"""
+Function Name : marker_corners()
+Input: rvec, tvec
+Output: image corners (4,2) of the marker in the order aruco reports them
+"""
+def marker_corners(rvec, tvec):
+        m = config.marker_length/2.0
+        pts = np.float32([[-m,m,0],[m,m,0],[m,-m,0],[-m,-m,0]])
+        imgpts, _ = cv2.projectPoints(pts, rvec, tvec, config.camera_matrix, config.dist_coeff)
+        return imgpts.reshape(4,2).astype(np.float32)
+
+"""
+Function Name : place_marker()
+Input: img (BGR, changed in place), marker id, corners (4,2)
+Output: None
+Purpose: Warps the marker with its white border onto the frame. The
+         homography maps the marker corners exactly, lens distortion between
+         the corners is not modelled. Only the box around the marker is warped
+         and blended.
+"""
+def place_marker(img, marker_id, corners):
+        marker, cell = marker_image(marker_id)
+        side = marker.shape[0]
+        src = np.float32([[cell,cell],[side - cell,cell],[side - cell,side - cell],[cell,side - cell]])
+        homography = cv2.getPerspectiveTransform(src, corners)
+        outline = cv2.perspectiveTransform(np.float32([[0,0],[side,0],[side,side],[0,side]]).reshape(-1,1,2),
+                                           homography).reshape(4,2)
+        x0, y0 = np.maximum(np.floor(outline.min(axis=0)).astype(int) - 1, 0)
+        x1, y1 = np.minimum(np.ceil(outline.max(axis=0)).astype(int) + 1, [img.shape[1], img.shape[0]])
+        if x1 <= x0 or y1 <= y0:
+                return
+        homography = np.array([[1,0,-x0],[0,1,-y0],[0,0,1]], np.float64).dot(homography)
+        size = (x1 - x0, y1 - y0)
+        warped = cv2.warpPerspective(marker, homography, size, flags=cv2.INTER_LINEAR)
+        mask = cv2.warpPerspective(np.full_like(marker, 255), homography, size, flags=cv2.INTER_LINEAR)
+        alpha = mask.astype(np.float32)[:,:,None]/255.0
+        roi = img[y0:y1, x0:x1]
+        roi[:] = (roi*(1 - alpha) + warped[:,:,None]*alpha).astype(np.uint8)
+
+"""
+Function Name : make_frame()
+Input: seed (frame index, makes the frame reproducible)
+Output: BGR frame, ground truth marker table
+"""
+def make_frame(seed):
+        rng = np.random.RandomState(seed)
+        cv2.setRNGSeed(seed)
+        img = background(rng)
+        w, h = config.size
+        count = rng.randint(config.markers[0], config.markers[1] + 1)
+        ids = np.asarray(config.ids if config.ids is not None else np.arange(50))
+        ids = rng.choice(ids, min(count, len(ids)), replace=False)
+        boxes, kept, all_corners, rvecs, tvecs = [], [], [], [], []
+        for marker_id in ids:
+                for _ in range(20):
+                        rvec, tvec = random_pose(rng)
+                        corners = marker_corners(rvec, tvec)
+                        lo, hi = corners.min(axis=0), corners.max(axis=0)
+                        pad = (hi - lo).max()*0.25
+                        box = np.concatenate([lo - pad, hi + pad])
+                        inside = (lo >= 2).all() and hi[0] < w - 2 and hi[1] < h - 2
+                        apart = all(box[2] < b[0] or b[2] < box[0] or box[3] < b[1] or b[3] < box[1] for b in boxes)
+                        if inside and apart:
+                                place_marker(img, marker_id, corners)
+                                boxes.append(box)
+                                kept.append(marker_id)
+                                all_corners.append(corners)
+                                rvecs.append(rvec)
+                                tvecs.append(tvec)
+                                break
+        # lighting: a brightness gradient across the frame and a gamma change
+        gx = np.linspace(-1, 1, w, dtype=np.float32)[None,:]*rng.uniform(-0.35, 0.35)
+        gy = np.linspace(-1, 1, h, dtype=np.float32)[:,None]*rng.uniform(-0.35, 0.35)
+        gain = (1.0 + gx + gy)*np.float32(rng.uniform(0.6, 1.2))
+        img = cv2.multiply(img.astype(np.float32), cv2.merge([gain]*3))
+        # gamma through a lookup table on the 8 bit image
+        img = np.clip(img, 0, 255).astype(np.uint8)
+        table = (255.0*(np.arange(256)/255.0)**rng.uniform(0.7, 1.4)).astype(np.uint8)
+        img = cv2.LUT(img, table)
+        sigma = rng.uniform(0, config.blur)
+        if sigma > 0.3:
+                img = cv2.GaussianBlur(img, (0, 0), sigma)
+        noise = np.empty(img.shape, np.int16)
+        cv2.randn(noise, 0, rng.uniform(0, config.noise))
+        img = cv2.add(img, noise, dtype=cv2.CV_8U)
+        table = make_marker_table(np.array(kept, np.int32), np.array(all_corners, np.float32).reshape(-1,4,2),
+                                  np.array(rvecs).reshape(-1,3), np.array(tvecs).reshape(-1,3))
+        return img, table
+
+"""
+Function Name : generate()
+Input: scene config, count, seed (of the first frame), workers (processes),
+       ahead (frames made ahead of the consumer per worker)
+Output: yields (index, frame, ground truth table) in order
+Purpose: Makes the frames on a process pool. Only a few frames per worker are
+         made ahead, so any number of frames can be streamed.
+"""
+def generate(scene_config, count, seed=0, workers=None, ahead=4):
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(scene_config,)) as pool:
+                window = ahead*(workers or os.cpu_count() or 1)
+                pending = []
+                for index in range(count):
+                        pending.append((index, pool.submit(make_frame, seed + index)))
+                        if len(pending) >= window:
+                                done, future = pending.pop(0)
+                                yield (done,) + future.result()
+                for done, future in pending:
+                        yield (done,) + future.result()
+
+"""
+Function Name : main()
+Purpose: Generates frames, saves the ground truth and optionally the frames.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Generate synthetic ArUco frames.')
+        parser.add_argument('--camera', default='Camera.npz', help='calibration file')
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--ids', type=int, nargs='*', default=None, help='marker ids, 0-49 by default')
+        parser.add_argument('--backgrounds', default=None, help='folder of background images')
+        parser.add_argument('--truth', default='synthetic_truth.store', help='ground truth results store')
+        parser.add_argument('--save', default=None, help='folder to write the frames to')
+        args = parser.parse_args()
+
+        with np.load(args.camera) as X:
+                camera_matrix, dist_coeff = X['mtx'], X['dist']
+        backgrounds = sorted(glob.glob(os.path.join(args.backgrounds, '*.jpg'))) if args.backgrounds else []
+        scene_config = SceneConfig(camera_matrix, dist_coeff, ids=args.ids, backgrounds=backgrounds)
+        truth = ResultStore(args.truth)
+        if args.save and not os.path.isdir(args.save):
+                os.makedirs(args.save)
+        start = time.perf_counter()
+        for index, frame, table in generate(scene_config, args.count, args.seed, args.workers):
+                name = 'synthetic_%06d.png' % (args.seed + index)
+                truth.append(table, name)
+                if args.save:
+                        cv2.imwrite(os.path.join(args.save, name), frame)
+        print('%d frames in %.1f s, ground truth in %s' % (args.count, time.perf_counter() - start, args.truth))
+
+
+if __name__ == "__main__":
+        main()
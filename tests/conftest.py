@@ -0,0 +1,13 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+"""
+TEST_IMAGES
+Folder of the Task 1.1 test images and the camera calibration they were
+taken with.
+"""
+TEST_IMAGES = os.path.join(ROOT, 'Task 1', 'Task 1.1', 'TestCases')
+CAMERA_FILE = os.path.join(ROOT, 'Task 1', 'Task 1.1', 'Problem Statement', 'Camera.npz')
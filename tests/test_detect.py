@@ -0,0 +1,98 @@
+import os
+import numpy as np
+import cv2
+import pytest
+import synthetic
+from conftest import TEST_IMAGES, CAMERA_FILE
+from detect import MarkerDetector, TiledDetector, copy_parameters, save_profile, tile_boxes
+
+
+with np.load(CAMERA_FILE) as X:
+        camera_matrix, dist_coeff = X['mtx'], X['dist']
+
+"""
+Function Name : square()
+Input: centre (x, y), side, angle in degrees
+Output: corners (4,2) of the marker, clockwise from the top left one
+"""
+def square(centre, side, angle=0.0):
+        c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+        unit = np.float32([[-1,-1],[1,-1],[1,1],[-1,1]])*side/2.0
+        return unit.dot(np.float32([[c, s], [-s, c]])) + np.float32(centre)
+
+"""
+Function Name : frame_with_markers()
+Input: size (width, height), list of (marker id, corners (4,2))
+Output: gray frame with the markers drawn on a plain background
+"""
+def frame_with_markers(size, markers):
+        synthetic.init_worker(synthetic.SceneConfig(camera_matrix, dist_coeff, size=size))
+        img = np.full((size[1], size[0], 3), 160, np.uint8)
+        for marker_id, corners in markers:
+                synthetic.place_marker(img, marker_id, corners)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def by_id(corners, ids):
+        return {int(i): c for c, i in zip(corners, ids)}
+
+
+def test_marker_across_tile_boundary():
+        # the first marker sits on the crossing of both seams of the 2x2 grid,
+        # the second is above max_marker and found by the downscaled pass
+        markers = [(3, square((640, 480), 140)), (7, square((250, 230), 300))]
+        gray = frame_with_markers((1280, 960), markers)
+        tiled = by_id(*TiledDetector(camera_matrix, dist_coeff, tiles=(2,2), max_marker=150).find_corners(gray))
+        full = by_id(*MarkerDetector(camera_matrix, dist_coeff).find_corners(gray))
+        assert sorted(tiled) == sorted(full) == [3, 7]
+        for marker_id, corners in markers:
+                assert np.abs(tiled[marker_id] - full[marker_id]).max() < 1.0
+                # the corners are not refined, they lie on the contour pixels
+                assert np.abs(tiled[marker_id] - corners).max() < 2.5
+
+def test_rotated_marker_across_tile_boundary():
+        # at 45 degrees the bounding box is sqrt(2) times the marker side
+        gray = frame_with_markers((1920, 1440), [(4, square((640, 480), 150, 45))])
+        detector = TiledDetector(camera_matrix, dist_coeff, tiles=(3,3), max_marker=150)
+        assert detector.grid(gray.shape) == (3, 3)
+        corners, ids = detector.find_corners(gray)
+        assert ids.tolist() == [4]
+        assert np.abs(corners[0] - square((640, 480), 150, 45)).max() < 2.5
+
+def test_overlap_must_fit_tiles():
+        with pytest.raises(ValueError):
+                tile_boxes((480, 640), (3,3), 229)
+
+def test_small_frame_is_not_tiled():
+        detector = TiledDetector(camera_matrix, dist_coeff, tiles=(3,3), max_marker=150)
+        assert detector.grid((480, 640)) == (1, 1)
+        assert detector.grid((960, 1280)) == (2, 1)
+
+def test_parameters_are_used():
+        gray = frame_with_markers((1280, 960), [(3, square((640, 480), 140)), (7, square((250, 230), 300))])
+        detector = TiledDetector(camera_matrix, dist_coeff, tiles=(2,2), max_marker=150)
+        parameters = copy_parameters(detector.parameters)
+        parameters.maxMarkerPerimeterRate = 4*200/1280.0
+        assert detector.find_corners(gray, parameters)[1].tolist() == [3]
+
+@pytest.mark.parametrize('resize', [1, 2, 3])
+@pytest.mark.parametrize('tiles', [(2,2), (3,3)])
+def test_tiles_match_the_single_pass(tiles, resize):
+        detector = TiledDetector(camera_matrix, dist_coeff, tiles=tiles, max_marker=100)
+        full = MarkerDetector(camera_matrix, dist_coeff)
+        for n in range(1, 9):
+                img = cv2.imread(os.path.join(TEST_IMAGES, 'image_%d.jpg' % n))
+                gray = cv2.cvtColor(cv2.resize(img, None, fx=resize, fy=resize), cv2.COLOR_BGR2GRAY)
+                expected = by_id(*full.find_corners(gray))
+                found = by_id(*detector.find_corners(gray))
+                assert sorted(found) == sorted(expected), n
+                for marker_id in expected:
+                        assert np.abs(found[marker_id] - expected[marker_id]).max() < 1.0
+
+def test_profile_only_when_asked(tmp_path, monkeypatch):
+        path = str(tmp_path/'detector_profile.npz')
+        parameters = copy_parameters(MarkerDetector(camera_matrix, dist_coeff).parameters)
+        parameters.minMarkerPerimeterRate = 0.2
+        save_profile(path, parameters, ['minMarkerPerimeterRate'])
+        monkeypatch.chdir(tmp_path)
+        assert MarkerDetector(camera_matrix, dist_coeff).parameters.minMarkerPerimeterRate == 0.03
+        assert MarkerDetector(camera_matrix, dist_coeff, profile=path).parameters.minMarkerPerimeterRate == 0.2
@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import cv2
+from conftest import TEST_IMAGES, CAMERA_FILE
+from detect import MarkerDetector, make_marker_table
+from tracking import AdaptiveDetector, FilteredDetector, GatedDetector, PoseFilter
+
+
+with np.load(CAMERA_FILE) as X:
+        camera_matrix, dist_coeff = X['mtx'], X['dist']
+images = [cv2.imread(os.path.join(TEST_IMAGES, 'image_%d.jpg' % n)) for n in range(1, 9)]
+
+"""
+SWITCHES
+Order the test images are shown in, every one for a few frames. Markers
+disappear, appear and jump between neighbouring images.
+"""
+SWITCHES = [0, 1, 2, 3, 4, 5, 6, 7, 2, 1, 5, 6, 4, 3, 0]
+
+"""
+Function Name : assert_same_markers()
+Input: detector, frames per image
+Purpose: Checks that the detector reports the ids of MarkerDetector on every
+         frame, with the centres within tolerance pixels.
+"""
+def assert_same_markers(detector, frames, tolerance=1.0):
+        full = MarkerDetector(camera_matrix, dist_coeff)
+        for n in SWITCHES:
+                expected = sorted(full.detect(images[n]), key=lambda marker: marker[0])
+                for _ in range(frames):
+                        found = sorted(detector.detect(images[n]), key=lambda marker: marker[0])
+                        assert [marker[0] for marker in found] == [marker[0] for marker in expected], n
+                        for marker, reference in zip(found, expected):
+                                assert np.hypot(marker[1][0] - reference[1][0],
+                                                marker[1][1] - reference[1][1]) < tolerance
+
+
+def test_filtered_detector_drops_lost_markers():
+        assert_same_markers(FilteredDetector(MarkerDetector(camera_matrix, dist_coeff)), 3)
+
+def test_filtered_gated_detector():
+        detector = FilteredDetector(GatedDetector(MarkerDetector(camera_matrix, dist_coeff)))
+        assert detector.marker_points[1,0] == 50
+        assert_same_markers(detector, 3)
+
+def test_gated_projections_follow_the_pose():
+        detector = GatedDetector(MarkerDetector(camera_matrix, dist_coeff))
+        points = np.float32([[0,0,0],[50,0,0],[0,0,50]])
+        detector.detect(images[0])
+        first = detector.project('axis', points, 6)
+        detector.detect(images[0])
+        assert detector.project('axis', points, 6) is first
+        marker = [x for x in detector.detect(images[5]) if x[0] == 6][0]
+        expected, _ = cv2.projectPoints(points, marker[2], marker[3], camera_matrix, dist_coeff)
+        assert np.allclose(detector.project('axis', points, 6), expected.reshape(-1,2))
+        detector.detect(images[1])
+        assert detector.project('axis', points, 6) is None
+
+def test_pose_filter_resets_on_a_jump():
+        pose_filter = PoseFilter()
+        def table(tvec):
+                return make_marker_table([2], np.zeros((1,4,2)), np.float64([[[0.1, 0.2, 0.3]]]),
+                                         np.float64([[tvec]]))
+        for _ in range(5):
+                pose_filter.step(table([0.0, 0.0, 500.0]))
+        ids, rvec, tvec, measured = pose_filter.step(table([200.0, 0.0, 500.0]))
+        assert ids.tolist() == [2] and measured.tolist() == [True]
+        assert np.allclose(tvec[0], [200.0, 0.0, 500.0])
+        ids, _, tvec, measured = pose_filter.step(None)
+        assert measured.tolist() == [False] and np.allclose(tvec[0], [200.0, 0.0, 500.0])
+        ids, _, _, _ = pose_filter.step(make_marker_table([], np.zeros((0,4,2)), np.zeros((0,1,3)),
+                                                          np.zeros((0,1,3))))
+        assert ids.tolist() == []
+
+def test_adaptive_detector_follows_id_changes():
+        # image_5 has ids 1 and 6, image_6 has 6 and 8: one marker goes as
+        # another one comes
+        full = MarkerDetector(camera_matrix, dist_coeff)
+        detector = AdaptiveDetector(camera_matrix, dist_coeff)
+        for n in SWITCHES + [4, 5, 4, 5, 6, 5]:
+                gray = cv2.cvtColor(images[n], cv2.COLOR_BGR2GRAY)
+                expected = sorted(full.find_corners(gray)[1].tolist())
+                for _ in range(3):
+                        assert sorted(detector.find_corners(gray)[1].tolist()) == expected, n
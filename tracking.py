@@ -0,0 +1,543 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: tracking.py
+*  Team: eYRC#TC#1155
+*
+*  Detection modes that use the previous frames to avoid scanning the
+*  whole image every time. They return the same aruco list as
+*  detect.MarkerDetector.
+*
+**************************************************************************
+"""
+
+import numpy as np
+import cv2
+import cv2.aruco as aruco
+from detect import MarkerDetector, copy_parameters, make_marker_table, table_to_list
+
+
+"""
+Function Name : marker_rois()
+Input: corners (N,4,2), padding (fraction of the marker size), shape of the image
+Output: rois (N,4) int array of x0, y0, x1, y1
+Purpose: Padded bounding box around each marker, clipped to the image.
+"""
+def marker_rois(corners, padding, shape):
+        lo = corners.min(axis=1)
+        hi = corners.max(axis=1)
+        pad = (hi - lo).max(axis=1, keepdims=True)*padding
+        lo = np.floor(lo - pad).astype(int)
+        hi = np.ceil(hi + pad).astype(int)
+        lo = np.maximum(lo, 0)
+        hi = np.minimum(hi, [shape[1], shape[0]])
+        return np.hstack([lo, hi])
+
+
+"""
+Function Name : merge_rois()
+Input: rois (N,4) array of x0, y0, x1, y1
+Output: list of rois where overlapping boxes are replaced by their union
+Purpose: Markers close together are detected in one pass instead of twice.
+"""
+def merge_rois(rois):
+        merged = [list(r) for r in rois]
+        changed = True
+        while changed:
+                changed = False
+                for i in range(len(merged)):
+                        for j in range(i+1, len(merged)):
+                                a, b = merged[i], merged[j]
+                                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                                        merged[i] = [min(a[0],b[0]), min(a[1],b[1]), max(a[2],b[2]), max(a[3],b[3])]
+                                        del merged[j]
+                                        changed = True
+                                        break
+                        if changed:
+                                break
+        return merged
+
+
+"""
+Class Name : RoiDetector
+Input: same as MarkerDetector, plus rescan_every (frames between full scans),
+       padding (ROI margin as a fraction of the marker size) and max_roi_area
+       (fraction of the frame above which a full scan is cheaper)
+Purpose: Runs aruco.detectMarkers only on padded regions around the markers
+         found in the previous frame. The full frame is scanned every
+         rescan_every frames, and straight away whenever a marker is lost, so
+         new markers are still picked up.
+"""
+class RoiDetector(MarkerDetector):
+        def __init__(self, *args, rescan_every=30, padding=0.3,
+                     max_roi_area=0.5, **kwargs):
+                MarkerDetector.__init__(self, *args, **kwargs)
+                self.rescan_every = rescan_every
+                self.padding = padding
+                self.max_roi_area = max_roi_area
+                self.last_corners = np.zeros((0,4,2), np.float32)
+                self.last_ids = np.zeros(0, np.int32)
+                self.frame_count = 0
+                self.full_scans = 0
+
+        """
+        Function Name : find_in_rois()
+        Input: gray (numpy array), parameters (optional, defaults to the
+               detector's own)
+        Output: corners (N,4,2), ids (N,), or None when the ROIs cover too much
+                of the frame
+        Purpose: Detects inside the ROIs of the last known markers and maps the
+                 corners back to full image coordinates.
+        """
+        def find_in_rois(self, gray, parameters=None):
+                rois = merge_rois(marker_rois(self.last_corners, self.padding, gray.shape))
+                area = sum((x1-x0)*(y1-y0) for x0, y0, x1, y1 in rois)
+                if area > self.max_roi_area*gray.shape[0]*gray.shape[1]:
+                        return None
+                found = {}
+                for x0, y0, x1, y1 in rois:
+                        corners, ids = MarkerDetector.find_corners(self, gray[y0:y1, x0:x1], parameters)
+                        corners += np.float32([x0, y0])
+                        for j in range(len(ids)):
+                                found.setdefault(int(ids[j]), corners[j])
+                if not found:
+                        return np.zeros((0,4,2), np.float32), np.zeros(0, np.int32)
+                return np.array(list(found.values()), np.float32), np.array(list(found.keys()), np.int32)
+
+        """
+        Function Name : find_corners()
+        Input: gray (numpy array), parameters (optional, defaults to the
+               detector's own)
+        Output: corners (N,4,2), ids (N,)
+        Purpose: ROI detection when possible, full frame scan otherwise.
+        """
+        def find_corners(self, gray, parameters=None):
+                self.frame_count += 1
+                tracked = None
+                if len(self.last_ids) and self.frame_count % self.rescan_every != 0:
+                        found = self.find_in_rois(gray, parameters)
+                        if found is not None and set(self.last_ids.tolist()) <= set(found[1].tolist()):
+                                tracked = found
+                if tracked is None:
+                        tracked = MarkerDetector.find_corners(self, gray, parameters)
+                        self.full_scans += 1
+                self.last_corners, self.last_ids = tracked
+                return tracked
+
+
+"""
+Class Name : FlowTracker
+Input: same as MarkerDetector, plus redetect_every (frames between full
+       detections), max_error (forward-backward error in pixels that is still
+       trusted) and win_size (Lucas-Kanade search window)
+Purpose: Follows the four corners of every marker from frame to frame with
+         pyramidal Lucas-Kanade optical flow and estimates the pose from the
+         propagated corners. The full ArUco detection only runs every
+         redetect_every frames, or when a corner can no longer be tracked.
+"""
+class FlowTracker(MarkerDetector):
+        def __init__(self, *args, redetect_every=15, max_error=1.0, win_size=(21,21), **kwargs):
+                MarkerDetector.__init__(self, *args, **kwargs)
+                self.redetect_every = redetect_every
+                self.max_error = max_error
+                self.lk_params = dict(winSize=win_size, maxLevel=3,
+                                      criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01))
+                self.subpix_criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.01)
+                self.prev_gray = None
+                self.last_corners = np.zeros((0,4,2), np.float32)
+                self.last_ids = np.zeros(0, np.int32)
+                self.frame_count = 0
+                self.full_detections = 0
+
+        """
+        Function Name : propagate()
+        Input: gray (numpy array)
+        Output: corners (N,4,2) moved into the new frame, or None if any corner
+                failed the forward-backward check or left the image
+        """
+        def propagate(self, gray):
+                pts = self.last_corners.reshape(-1,1,2)
+                nxt, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, pts, None, **self.lk_params)
+                back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, nxt, None, **self.lk_params)
+                error = np.linalg.norm((back - pts).reshape(-1,2), axis=1)
+                ok = (status.ravel() == 1) & (status_back.ravel() == 1) & (error < self.max_error)
+                h, w = gray.shape[:2]
+                inside = ((nxt[:,0,0] >= 0) & (nxt[:,0,0] < w) & (nxt[:,0,1] >= 0) & (nxt[:,0,1] < h))
+                if not (ok & inside).all():
+                        return None
+                # snap back onto the black square corners so the error does not build up
+                cv2.cornerSubPix(gray, nxt, (5,5), (-1,-1), self.subpix_criteria)
+                return nxt.reshape(-1,4,2)
+
+        """
+        Function Name : find_corners()
+        Input: gray (numpy array), parameters (optional, defaults to the
+               detector's own, used by the full detections)
+        Output: corners (N,4,2), ids (N,)
+        Purpose: Optical flow when tracking is reliable, full detection otherwise.
+        """
+        def find_corners(self, gray, parameters=None):
+                self.frame_count += 1
+                tracked = None
+                if len(self.last_ids) and self.frame_count % self.redetect_every != 0:
+                        corners = self.propagate(gray)
+                        if corners is not None:
+                                tracked = corners, self.last_ids
+                if tracked is None:
+                        tracked = MarkerDetector.find_corners(self, gray, parameters)
+                        self.full_detections += 1
+                self.prev_gray = gray.copy()
+                self.last_corners, self.last_ids = tracked
+                return tracked
+
+
+"""
+Function Name : closest_rvec()
+Input: rvec (3,), reference rvec (3,)
+Output: rvec describing the same rotation, closest to the reference
+Purpose: r and r - 2*pi*r/|r| are the same rotation. Picking the one near the
+         prediction stops the filter from averaging across the flip.
+"""
+def closest_rvec(rvec, reference):
+        angle = np.linalg.norm(rvec)
+        if angle < 1e-9:
+                return rvec
+        other = rvec - 2*np.pi*rvec/angle
+        if np.linalg.norm(other - reference) < np.linalg.norm(rvec - reference):
+                return other
+        return rvec
+
+
+"""
+Class Name : PoseFilter
+Input: measurement_noise (std of tvec, std of rvec), process_noise (std of the
+       change in velocity per frame, for tvec and rvec), max_missing
+       (detections in a row a marker may be missed before its track is
+       dropped), gate (largest distance of a detection from the prediction,
+       for tvec and rvec, before the track is started again at the detection)
+Purpose: One constant velocity Kalman filter (cv2.KalmanFilter) per marker on
+         [tvec, rvec]. step() is called once per frame with the detected
+         marker table, or None on frames where detection was skipped, and
+         returns the filtered (or predicted) pose of every marker found by
+         the last detection. A missed marker is not reported, its track is
+         only kept to continue the filter when it is found again.
+"""
+class PoseFilter:
+        def __init__(self, measurement_noise=(2.0, 0.02), process_noise=(1.0, 0.01), max_missing=5,
+                     gate=(50.0, 0.5)):
+                self.measurement_noise = measurement_noise
+                self.process_noise = process_noise
+                self.max_missing = max_missing
+                self.gate = gate
+                self.tracks = {}
+
+        """
+        Function Name : new_track()
+        Input: rvec (3,), tvec (3,)
+        Output: cv2.KalmanFilter started at the pose with zero velocity
+        """
+        def new_track(self, rvec, tvec):
+                kf = cv2.KalmanFilter(12, 6)
+                kf.transitionMatrix = np.eye(12, dtype=np.float32)
+                kf.transitionMatrix[:6,6:] = np.eye(6, dtype=np.float32)
+                kf.measurementMatrix = np.eye(6, 12, dtype=np.float32)
+                q = np.repeat(np.float32(self.process_noise)**2, 3)
+                kf.processNoiseCov = np.diag(np.concatenate([q*0.25, q])).astype(np.float32)
+                r = np.repeat(np.float32(self.measurement_noise)**2, 3)
+                kf.measurementNoiseCov = np.diag(r).astype(np.float32)
+                kf.errorCovPost = np.diag(np.concatenate([r, r*10])).astype(np.float32)
+                kf.statePost = np.concatenate([tvec, rvec, np.zeros(6)]).astype(np.float32).reshape(12,1)
+                return kf
+
+        """
+        Function Name : step()
+        Input: marker table of this frame, or None if detection was skipped
+        Output: ids (N,), rvec (N,3), tvec (N,3), measured (N,) bool
+        """
+        def step(self, table=None):
+                for track in self.tracks.values():
+                        track['kf'].predict()
+                found = set()
+                if table is not None:
+                        for j in range(len(table)):
+                                marker_id = int(table['id'][j])
+                                rvec = table['rvec'][j].reshape(3)
+                                tvec = table['tvec'][j].reshape(3)
+                                found.add(marker_id)
+                                track = self.tracks.get(marker_id)
+                                if track is not None:
+                                        predicted = track['kf'].statePre[:6,0]
+                                        rvec = closest_rvec(rvec, predicted[3:6])
+                                        if np.linalg.norm(tvec - predicted[0:3]) > self.gate[0] or \
+                                           np.linalg.norm(rvec - predicted[3:6]) > self.gate[1]:
+                                                track = None
+                                if track is None:
+                                        self.tracks[marker_id] = {'kf': self.new_track(rvec, tvec), 'missing': 0}
+                                        continue
+                                track['kf'].correct(np.concatenate([tvec, rvec]).astype(np.float32).reshape(6,1))
+                                track['missing'] = 0
+                        for marker_id, track in list(self.tracks.items()):
+                                if marker_id not in found:
+                                        track['missing'] += 1
+                                        if track['missing'] > self.max_missing:
+                                                del self.tracks[marker_id]
+                ids = np.array(sorted(k for k, t in self.tracks.items() if t['missing'] == 0), np.int32)
+                # predict() copies its result into statePost, so this is the
+                # prediction on frames without a measurement
+                state = np.array([self.tracks[k]['kf'].statePost[:6,0] for k in ids], np.float64).reshape(-1,6)
+                measured = np.array([k in found for k in ids], bool)
+                return ids, state[:,3:6], state[:,0:3], measured
+
+
+"""
+Function Name : base_detector()
+Input: detector, a MarkerDetector or a wrapper of one like GatedDetector
+Output: the MarkerDetector, found through the .detector of the wrappers
+"""
+def base_detector(detector):
+        while not hasattr(detector, 'camera_matrix'):
+                detector = detector.detector
+        return detector
+
+
+"""
+Class Name : FilteredDetector
+Input: detector (any MarkerDetector, or a wrapper of one like GatedDetector),
+       detect_every (run detection on every k-th frame only), marker_length,
+       camera_matrix and dist_coeff (those of the detector if None), and the
+       PoseFilter arguments
+Purpose: Smooths the poses from the detector with a PoseFilter and, with
+         detect_every above 1, lets the filter predict the poses on the frames
+         in between. Corners and centres are projected from the filtered poses
+         so the aruco list stays consistent with rvec and tvec.
+"""
+class FilteredDetector:
+        def __init__(self, detector, detect_every=1, marker_length=None, camera_matrix=None, dist_coeff=None,
+                     **kwargs):
+                self.detector = detector
+                self.detect_every = detect_every
+                self.filter = PoseFilter(**kwargs)
+                self.frame_count = 0
+                base = base_detector(detector)
+                self.camera_matrix = base.camera_matrix if camera_matrix is None else camera_matrix
+                self.dist_coeff = base.dist_coeff if dist_coeff is None else dist_coeff
+                m = (base.marker_length if marker_length is None else marker_length)/2.0
+                self.marker_points = np.float32([[-m,m,0],[m,m,0],[m,-m,0],[-m,-m,0]])
+
+        """
+        Function Name : detect_table()
+        Input: img (numpy array, BGR or already gray)
+        Output: marker table of the filtered or predicted poses
+        """
+        def detect_table(self, img):
+                table = None
+                if self.frame_count % self.detect_every == 0:
+                        table = self.detector.detect_table(img)
+                self.frame_count += 1
+                ids, rvec, tvec, _ = self.filter.step(table)
+                corners = np.zeros((len(ids),4,2), np.float32)
+                for j in range(len(ids)):
+                        imgpts, _ = cv2.projectPoints(self.marker_points, rvec[j], tvec[j],
+                                                      self.camera_matrix, self.dist_coeff)
+                        corners[j] = imgpts.reshape(4,2)
+                return make_marker_table(ids, corners, rvec, tvec)
+
+        """
+        Function Name : detect()
+        Input: img (numpy array)
+        Output: aruco list in the form [(aruco_id_1, centre_1, rvec_1, tvec_1), ...]
+        """
+        def detect(self, img):
+                return table_to_list(self.detect_table(img))
+
+
+"""
+Class Name : AdaptiveDetector
+Input: same as MarkerDetector, plus margin (how far the perimeter limits are
+       set around the observed marker perimeters, as a factor) and
+       retune_every (frames between detections with the default parameters)
+Purpose: Tunes the DetectorParameters from the markers found in the previous
+         frame. The perimeter limits are narrowed to the observed marker size,
+         and the adaptive threshold sweep (3, 13, 23 by default) is cut down to
+         a single window: the windows of the default sweep are tried alone,
+         closest to the marker cell size first, and the first one that finds
+         all the markers is kept. When any marker of the previous frame is not
+         found, the frame is detected again with the default parameters and
+         the parameters are tuned again. The defaults are also used every
+         retune_every frames, so a marker that comes into view outside the
+         tuned limits is found at most retune_every frames late.
+"""
+class AdaptiveDetector(MarkerDetector):
+        def __init__(self, *args, margin=1.5, retune_every=10, **kwargs):
+                MarkerDetector.__init__(self, *args, **kwargs)
+                self.margin = margin
+                self.retune_every = retune_every
+                self.frame_count = 0
+                self.defaults = copy_parameters(self.parameters)
+                self.windows = list(range(self.defaults.adaptiveThreshWinSizeMin,
+                                          self.defaults.adaptiveThreshWinSizeMax + 1,
+                                          self.defaults.adaptiveThreshWinSizeStep))
+                self.tuned = None
+                self.last_ids = set()
+                self.retunes = 0
+
+        """
+        Function Name : tune()
+        Input: gray, corners (N,4,2) and ids (N,) of the markers found in it
+        Output: DetectorParameters narrowed to these markers
+        """
+        def tune(self, gray, corners, ids):
+                self.retunes += 1
+                parameters = copy_parameters(self.defaults)
+                sides = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2)
+                perimeters = sides.sum(axis=1)
+                size = float(max(gray.shape[:2]))
+                parameters.minMarkerPerimeterRate = max(perimeters.min()/self.margin/size,
+                                                        self.defaults.minMarkerPerimeterRate)
+                parameters.maxMarkerPerimeterRate = min(perimeters.max()*self.margin/size,
+                                                        self.defaults.maxMarkerPerimeterRate)
+                # 5x5 bits plus the black border is 7 cells across
+                cell = sides.min()*self.scale/7.0
+                wanted = set(ids.tolist())
+                for window in sorted(self.windows, key=lambda w: abs(w - cell)):
+                        parameters.adaptiveThreshWinSizeMin = window
+                        parameters.adaptiveThreshWinSizeMax = window
+                        if wanted <= set(MarkerDetector.find_corners(self, gray, parameters)[1].tolist()):
+                                return parameters
+                parameters.adaptiveThreshWinSizeMin = self.defaults.adaptiveThreshWinSizeMin
+                parameters.adaptiveThreshWinSizeMax = self.defaults.adaptiveThreshWinSizeMax
+                return parameters
+
+        """
+        Function Name : find_corners()
+        Input: gray (numpy array)
+        Output: corners (N,4,2), ids (N,)
+        Purpose: Detects with the tuned parameters, falls back to the defaults
+                 and tunes again when a marker of the previous frame is missing.
+        """
+        def find_corners(self, gray, parameters=None):
+                if parameters is not None:
+                        return MarkerDetector.find_corners(self, gray, parameters)
+                self.frame_count += 1
+                corners, ids = [], []
+                if self.tuned is not None and self.frame_count % self.retune_every != 0:
+                        corners, ids = MarkerDetector.find_corners(self, gray, self.tuned)
+                if self.tuned is None or self.frame_count % self.retune_every == 0 or \
+                   not self.last_ids <= set(ids.tolist()):
+                        corners, ids = MarkerDetector.find_corners(self, gray, self.defaults)
+                        self.tuned = self.tune(gray, corners, ids) if len(ids) else None
+                self.last_ids = set(ids.tolist())
+                return corners, ids
+
+
+"""
+Class Name : GatedDetector
+Input: detector (any MarkerDetector), size (width, height of the gray thumbnail
+       the frames are compared on), threshold (mean absolute difference of the
+       whole thumbnail, in gray levels), block (block size in thumbnail pixels),
+       block_threshold (mean absolute difference of any one block), max_skip
+       (frames after which detection runs even if nothing changed)
+Purpose: Skips detection while the camera sees the same picture, for example
+         while the robot stands still to pick up a pebble. Each frame is shrunk
+         to a small gray thumbnail and compared with the thumbnail of the last
+         frame detection ran on. If neither the whole thumbnail nor any block of
+         it changed by more than the thresholds, the last marker table and aruco
+         list are returned again (the same objects), together with any points
+         projected for them through project(). The block check catches a small
+         marker moving, which hardly changes the mean of the whole frame.
+"""
+class GatedDetector:
+        def __init__(self, detector, size=(80,60), threshold=2.0, block=10, block_threshold=8.0, max_skip=30):
+                self.detector = detector
+                self.size = size
+                self.threshold = threshold
+                self.block = block
+                self.block_threshold = block_threshold
+                self.max_skip = max_skip
+                self.reference = None
+                self.table = None
+                self.ar_list = []
+                self.projections = {}
+                self.changed = True
+                self.skipped = 0
+                self.frames_skipped = 0
+                self.frame_count = 0
+
+        """
+        Function Name : thumbnail()
+        Input: img (numpy array, BGR or already gray)
+        Output: gray thumbnail (int16) of self.size
+        """
+        def thumbnail(self, img):
+                small = cv2.resize(img, self.size, interpolation=cv2.INTER_AREA)
+                if small.ndim == 3:
+                        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                return small.astype(np.int16)
+
+        """
+        Function Name : difference()
+        Input: thumbnail
+        Output: mean absolute difference to the reference over the whole
+                thumbnail, and the largest over its blocks
+        """
+        def difference(self, small):
+                diff = np.abs(small - self.reference).astype(np.float32)
+                h, w = diff.shape
+                b = self.block
+                blocks = diff[:h - h % b, :w - w % b].reshape(h//b, b, w//b, b).mean(axis=(1,3))
+                return float(diff.mean()), float(blocks.max())
+
+        """
+        Function Name : detect_table()
+        Input: img (numpy array, BGR or already gray)
+        Output: marker table, detected again only if the frame changed
+        """
+        def detect_table(self, img):
+                self.frame_count += 1
+                small = self.thumbnail(img)
+                self.changed = True
+                if self.reference is not None and self.skipped < self.max_skip:
+                        mean, block = self.difference(small)
+                        self.changed = mean > self.threshold or block > self.block_threshold
+                if not self.changed:
+                        self.skipped += 1
+                        self.frames_skipped += 1
+                        return self.table
+                self.reference = small
+                self.skipped = 0
+                self.table = self.detector.detect_table(img)
+                self.ar_list = table_to_list(self.table)
+                return self.table
+
+        """
+        Function Name : detect()
+        Input: img (numpy array)
+        Output: aruco list in the form [(aruco_id_1, centre_1, rvec_1, tvec_1), ...]
+        """
+        def detect(self, img):
+                self.detect_table(img)
+                return self.ar_list
+
+        """
+        Function Name : project()
+        Input: name (key of the model), points (M,3) in marker coordinates, marker_id
+        Output: image points (M,2) on the marker, or None if it is not in the table
+        Purpose: Projects the points with the marker's last accepted pose. The
+                 result is kept with the pose it was projected for and reused
+                 until the marker's pose changes, so skipped frames and markers
+                 that did not move cost no cv2.projectPoints call.
+        """
+        def project(self, name, points, marker_id):
+                rows = self.table[self.table['id'] == marker_id] if self.table is not None else []
+                if len(rows) == 0:
+                        return None
+                rvec, tvec = rows['rvec'][0], rows['tvec'][0]
+                key = (name, marker_id)
+                cached = self.projections.get(key)
+                if cached is None or not (np.array_equal(cached[0], rvec) and np.array_equal(cached[1], tvec)):
+                        base = base_detector(self.detector)
+                        imgpts, _ = cv2.projectPoints(np.float32(points), rvec, tvec, base.camera_matrix, base.dist_coeff)
+                        cached = self.projections[key] = (rvec.copy(), tvec.copy(), imgpts.reshape(-1,2))
+                return cached[2]
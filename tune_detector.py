@@ -0,0 +1,182 @@
+"""
+**************************************************************************
+*                  E-Yantra Robotics Competition
+*                  ================================
+*  Theme: Thirsty Crow
+*  Filename: tune_detector.py
+*  Team: eYRC#TC#1155
+*
+*  Sweeps ArUco DetectorParameters over the test images (and any recorded
+*  frames), measures detection time, recall and pose error, prints the
+*  Pareto front and saves the fastest good enough settings as a profile
+*  (detect.PROFILE_FILE by default). It is only applied where asked for:
+*  MarkerDetector(profile=...), run_testsuite.py --profile or
+*  DETECTOR_PROFILE in opengl_final.py.
+*
+*  python tune_detector.py --camera Camera.npz
+*         --images "Task 1/Task 1.1/TestCases"
+*         --results "Task 1/Task 1.1/eYRC#TC#1155#Task1.1/Results.npz"
+*         --frames recorded_frames
+*
+**************************************************************************
+"""
+
+import argparse
+import itertools
+import os
+import re
+import numpy as np
+import cv2.aruco as aruco
+from detect import MarkerDetector, copy_parameters, make_marker_table, save_profile, PROFILE_FILE
+from benchmark import load_images, time_detector, summarise
+
+"""
+SWEEP
+Values tried for each setting. The three adaptive threshold settings are
+swept together as (min, max, step).
+"""
+SWEEP = {
+        'adaptiveThresh': [(3,23,10), (3,13,10), (13,23,10), (13,13,10), (23,23,10), (5,21,4)],
+        'cornerRefinementMethod': [aruco.CORNER_REFINE_NONE, aruco.CORNER_REFINE_SUBPIX,
+                                   aruco.CORNER_REFINE_CONTOUR],
+        'polygonalApproxAccuracyRate': [0.03, 0.05, 0.08],
+        'minMarkerPerimeterRate': [0.03, 0.1, 0.2],
+        'maxMarkerPerimeterRate': [4.0, 2.0],
+}
+PROFILE_NAMES = ['adaptiveThreshWinSizeMin', 'adaptiveThreshWinSizeMax', 'adaptiveThreshWinSizeStep',
+                 'cornerRefinementMethod', 'polygonalApproxAccuracyRate',
+                 'minMarkerPerimeterRate', 'maxMarkerPerimeterRate']
+
+
+"""
+Function Name : load_reference()
+Input: path of a Results.npz saved by TestSuite.py
+Output: dict of image file name (image_1.jpg ...) to marker table
+"""
+def load_reference(path):
+        reference = {}
+        with np.load(path, allow_pickle=True) as X:
+                for key in X.files:
+                        rows = X[key].reshape(-1,4) if X[key].size else np.zeros((0,4), object)
+                        ids = np.array([int(r[0]) for r in rows], np.int32)
+                        centres = [np.float32(r[1]) for r in rows]
+                        # the saved results have no corners, use the centre for all four
+                        corners = np.repeat(np.array(centres, np.float32).reshape(-1,1,2), 4, axis=1)
+                        rvec = np.array([np.asarray(r[2], np.float64).reshape(3) for r in rows]).reshape(-1,3)
+                        tvec = np.array([np.asarray(r[3], np.float64).reshape(3) for r in rows]).reshape(-1,3)
+                        name = re.sub(r'^image(\d+)$', r'image_\1.jpg', key)
+                        reference[name] = make_marker_table(ids, corners, rvec, tvec)
+        return reference
+
+"""
+Function Name : sweep_parameters()
+Input: base parameters
+Output: list of (settings dict, DetectorParameters) for every combination
+"""
+def sweep_parameters(base):
+        names = list(SWEEP)
+        combos = []
+        for values in itertools.product(*[SWEEP[name] for name in names]):
+                parameters = copy_parameters(base)
+                settings = dict(zip(names, values))
+                (parameters.adaptiveThreshWinSizeMin, parameters.adaptiveThreshWinSizeMax,
+                 parameters.adaptiveThreshWinSizeStep) = settings['adaptiveThresh']
+                for name in names[1:]:
+                        setattr(parameters, name, settings[name])
+                combos.append((settings, parameters))
+        return combos
+
+"""
+Function Name : pareto_front()
+Input: list of result dicts with 'ms', 'recall' and 'error'
+Output: the results no other result beats on all three (faster, higher recall
+        and lower error), sorted by time
+"""
+def pareto_front(results):
+        front = []
+        for a in results:
+                dominated = False
+                for b in results:
+                        if (b['ms'] <= a['ms'] and b['recall'] >= a['recall'] and b['error'] <= a['error'] and
+                            (b['ms'] < a['ms'] or b['recall'] > a['recall'] or b['error'] < a['error'])):
+                                dominated = True
+                                break
+                if not dominated:
+                        front.append(a)
+        return sorted(front, key=lambda r: r['ms'])
+
+"""
+Function Name : evaluate()
+Input: detector, images, reference tables (same order), repeat
+Output: result dict with time (ms per image), recall and pose error
+"""
+def evaluate(detector, images, references, repeat):
+        ms, tables = time_detector(detector, images, repeat)
+        total = summarise(references, tables)
+        wanted = total['matched'] + total['missed']
+        return {'ms': ms, 'recall': total['matched']/float(wanted) if wanted else 1.0,
+                'extra': total['extra'], 'error': total['tvec'], 'rvec': total['rvec']}
+
+"""
+Function Name : main()
+Purpose: Parses the command line, runs the sweep and saves the profile.
+"""
+def main():
+        parser = argparse.ArgumentParser(description='Tune the ArUco DetectorParameters.')
+        parser.add_argument('--camera', default='Camera.npz', help='calibration file')
+        parser.add_argument('--images', default=os.path.join('Task 1', 'Task 1.1', 'TestCases'))
+        parser.add_argument('--results', default=os.path.join('Task 1', 'Task 1.1', 'eYRC#TC#1155#Task1.1', 'Results.npz'),
+                            help='Results.npz with the expected markers of --images')
+        parser.add_argument('--frames', nargs='*', default=[],
+                            help='folders of recorded frames, checked against the default parameters')
+        parser.add_argument('--repeat', type=int, default=2)
+        parser.add_argument('--max-error', type=float, default=1.0,
+                            help='allowed tvec error above the default parameters, in %% of distance')
+        parser.add_argument('--out', default=PROFILE_FILE)
+        args = parser.parse_args()
+
+        with np.load(args.camera) as X:
+                camera_matrix, dist_coeff = X['mtx'], X['dist']
+        default = MarkerDetector(camera_matrix, dist_coeff, profile=None)
+
+        images = load_images(args.images)
+        reference = load_reference(args.results) if os.path.exists(args.results) else {}
+        references = [reference[name] if name in reference else default.detect_table(gray) for name, gray in images]
+        for folder in args.frames:
+                frames = load_images(folder)
+                images += frames
+                references += [default.detect_table(gray) for _, gray in frames]
+        if not images:
+                raise SystemExit('no images to tune on')
+
+        baseline = evaluate(default, images, references, args.repeat)
+        print('default          %8.2f ms  recall %.3f  tvec error %6.2f %%' %
+              (baseline['ms'], baseline['recall'], baseline['error']))
+
+        results = []
+        combos = sweep_parameters(default.parameters)
+        for n, (settings, parameters) in enumerate(combos):
+                detector = MarkerDetector(camera_matrix, dist_coeff, profile=None)
+                detector.parameters = parameters
+                result = evaluate(detector, images, references, args.repeat)
+                result['settings'], result['parameters'] = settings, parameters
+                results.append(result)
+                print('\r%d/%d' % (n + 1, len(combos)), end='', flush=True)
+        print()
+
+        print('Pareto front (time, recall, tvec error):')
+        for result in pareto_front(results):
+                print('%8.2f ms  recall %.3f  extra %2d  tvec error %6.2f %%  %s' %
+                      (result['ms'], result['recall'], result['extra'], result['error'], result['settings']))
+
+        good = [r for r in results if r['recall'] >= baseline['recall'] and r['extra'] <= baseline['extra']
+                and r['error'] <= baseline['error'] + args.max_error]
+        if not good:
+                raise SystemExit('no setting is as good as the defaults, no profile saved')
+        best = min(good, key=lambda r: r['ms'])
+        save_profile(args.out, best['parameters'], PROFILE_NAMES)
+        print('saved %s: %.2f ms (default %.2f ms)  %s' % (args.out, best['ms'], baseline['ms'], best['settings']))
+
+
+if __name__ == "__main__":
+        main()